@@ -1,3 +1,4 @@
+from . import db  # noqa: F401 - connects the SQLite pragma hook
 from .celery import app as celery_app
 
 __all__ = ["celery_app"]
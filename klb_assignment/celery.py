@@ -4,6 +4,8 @@ import os
 
 from celery import Celery
 
+from . import metrics  # noqa: F401 - records task durations via Celery signals
+
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "klb_assignment.settings")
 
 app = Celery("klb_assignment")
@@ -0,0 +1,302 @@
+"""Request and task metrics exposed in the Prometheus text format.
+
+``MetricsMiddleware`` records per-route latency, database queries and
+response sizes in a per-process registry. Celery task durations are
+recorded through task signals in the worker processes, so they go to the
+shared ``METRICS_CACHE_ALIAS`` cache instead. ``metrics_view`` serves both.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.core.cache import caches
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _format_labels(names: Iterable[str], values: Iterable[object]) -> str:
+    """Render a Prometheus label set."""
+    pairs = []
+    for name, value in zip(names, values, strict=True):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic counter partitioned by labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...]) -> None:
+        """Initialize an empty counter."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1) -> None:
+        """Add ``amount`` to the series identified by ``labels``."""
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self) -> list[str]:
+        """Return the counter in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram partitioned by labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...], buckets: tuple[float, ...]) -> None:
+        """Initialize an empty histogram."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        """Record one observation in the series identified by ``labels``."""
+        with self._lock:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        """Return the histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = (*self.labelnames, "le")
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip((*self.buckets, "+Inf"), series[:-1], strict=True):
+                    lines.append(f"{self.name}_bucket{_format_labels(names, (*labels, bound))} {count}")
+                base = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{base} {series[-1]}")
+                lines.append(f"{self.name}_count{base} {series[-2]}")
+        return lines
+
+
+class CacheHistogram:
+    """Histogram kept in a cache shared by several processes.
+
+    An observation increments the counter of the one bucket it falls in and
+    the sum (in microseconds); cumulative counts are computed when rendering.
+    Increments are atomic on Redis, but racy on caches without an atomic
+    ``incr`` such as the file cache.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...], buckets: tuple[float, ...]) -> None:
+        """Initialize a histogram on ``METRICS_CACHE_ALIAS``."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+
+    def _key(self, labels: tuple, part: object) -> str:
+        """Return the cache key of one counter of a series."""
+        return ":".join(["metrics", self.name, *map(str, labels), str(part)])
+
+    def observe(self, labels: tuple, value: float) -> None:
+        """Record one observation in the series identified by ``labels``."""
+        cache = caches[settings.METRICS_CACHE_ALIAS]
+        series_key = f"metrics:{self.name}:series"
+        series = cache.get(series_key) or []
+        if list(labels) not in series:
+            cache.set(series_key, [*series, list(labels)], timeout=None)
+        bucket = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        for part, amount in ((bucket, 1), ("sum_us", round(value * 1_000_000))):
+            key = self._key(labels, part)
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, amount)
+
+    def render(self) -> list[str]:
+        """Return the histogram in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        cache = caches[settings.METRICS_CACHE_ALIAS]
+        names = (*self.labelnames, "le")
+        parts = [*range(len(self.buckets) + 1), "sum_us"]
+        for labels in sorted(map(tuple, cache.get(f"metrics:{self.name}:series") or [])):
+            values = cache.get_many([self._key(labels, part) for part in parts])
+            counts = [values.get(self._key(labels, part), 0) for part in parts[:-1]]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts, strict=True):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, (*labels, bound))} {cumulative}")
+            base = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{base} {values.get(self._key(labels, 'sum_us'), 0) / 1_000_000}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("route", "method", "status"))
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("route", "method"), LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries per HTTP request.", ("route", "method"), QUERY_BUCKETS,
+)
+REQUEST_QUERY_TIME = Histogram(
+    "http_request_db_duration_seconds", "Time spent in database queries per HTTP request.", ("route", "method"), LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size.", ("route", "method"), SIZE_BUCKETS,
+)
+TASK_DURATION = CacheHistogram(
+    "celery_task_duration_seconds", "Celery task run time across all workers.", ("task", "state"), LATENCY_BUCKETS,
+)
+
+REGISTRY = (REQUESTS, REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_QUERY_TIME, RESPONSE_SIZE, TASK_DURATION)
+
+
+class _QueryRecorder:
+    """Counter and timer of one request's database queries."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute: Callable, sql: str, params: object, many: bool, context: dict) -> object:  # noqa: FBT001
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+# The recorder of the request being handled. Context variables follow the
+# request into sync_to_async threads, where async views run their queries.
+_current_recorder: ContextVar[_QueryRecorder | None] = ContextVar("metrics_query_recorder", default=None)
+
+
+def _record_query(execute: Callable, sql: str, params: object, many: bool, context: dict) -> object:  # noqa: FBT001
+    """Execute wrapper that passes queries to the current request's recorder, if any."""
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_query_recorder(sender: type[BaseDatabaseWrapper], connection: BaseDatabaseWrapper, **kwargs: object) -> None:  # noqa: ARG001
+    """Route every query of a new connection, in whatever thread, through ``_record_query``."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class MetricsMiddleware:
+    """Record latency, database usage and response size for every request.
+
+    Both sync- and async-capable, so under ASGI it does not force the async
+    views onto a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        """Store the next handler in the chain."""
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Handle the request and record its metrics."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = _QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        """Handle the request on the event loop and record its metrics."""
+        recorder = _QueryRecorder()
+        token = _current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        self.record(request, response, time.perf_counter() - started, recorder)
+        return response
+
+    def record(self, request: HttpRequest, response: HttpResponse, elapsed: float, recorder: _QueryRecorder) -> None:
+        """Add one request's measurements to the registry."""
+        match = getattr(request, "resolver_match", None)
+        labels = (match.route if match else "<unmatched>", request.method)
+        REQUESTS.inc((*labels, response.status_code))
+        REQUEST_LATENCY.observe(labels, elapsed)
+        REQUEST_QUERIES.observe(labels, recorder.count)
+        REQUEST_QUERY_TIME.observe(labels, recorder.seconds)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(labels, len(response.content))
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Serve the registry in the Prometheus text exposition format.
+
+    Only clients in ``METRICS_ALLOWED_IPS`` or sending ``METRICS_TOKEN`` as a
+    bearer token may scrape it.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get("Authorization", "")
+    allowed = request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS or (
+        token and constant_time_compare(authorization, f"Bearer {token}")
+    )
+    if not allowed:
+        return HttpResponseForbidden("Metrics are restricted.\n", content_type="text/plain")
+    lines = [line for metric in REGISTRY for line in metric.render()]
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+_task_started: dict[str, float] = {}
+
+
+@task_prerun.connect
+def _record_task_start(task_id: str, **kwargs: object) -> None:  # noqa: ARG001
+    """Remember when a Celery task started running."""
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _record_task_duration(task_id: str, task: object, state: str | None = None, **kwargs: object) -> None:  # noqa: ARG001
+    """Record how long a Celery task ran."""
+    started = _task_started.pop(task_id, None)
+    if started is None:
+        return
+    try:
+        TASK_DURATION.observe((task.name, state or "UNKNOWN"), time.perf_counter() - started)
+    except Exception:
+        # Losing a sample is better than failing the task over the metrics cache
+        logger.exception("Failed to record the duration of %s", task.name)
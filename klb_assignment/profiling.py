@@ -0,0 +1,125 @@
+"""Opt-in cProfile and SQL capture for individual requests.
+
+``RequestProfilingMiddleware`` is inert unless ``REQUEST_PROFILING_ENABLED``
+is set. It then profiles a request when the ``REQUEST_PROFILING_HEADER``
+header carries ``REQUEST_PROFILING_TOKEN``, or when the request is picked by
+``REQUEST_PROFILING_SAMPLE_RATE``. Each profiled request leaves two files in
+``REQUEST_PROFILING_DIR``, named after the resolved view:
+
+- ``<id>.prof``, a cProfile dump for ``python -m pstats`` or snakeviz
+- ``<id>.json``, the request, its timing and every SQL statement it ran
+
+SQL parameters are not recorded, since they carry passwords and emails. The
+profile covers the request thread only; async views are profiled just up to
+the point where they hand off to the event loop.
+"""
+
+import cProfile
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+# Only one cProfile profiler can be active per process on Python 3.12+,
+# so concurrent requests that are picked while another runs go unprofiled
+_profiler_lock = threading.Lock()
+
+
+class _QueryLog:
+    """Database execute wrapper that records each statement and its duration."""
+
+    def __init__(self) -> None:
+        self.queries: list[dict] = []
+
+    def __call__(self, execute: Callable, sql: str, params: object, many: bool, context: dict) -> object:  # noqa: FBT001
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "alias": context["connection"].alias,
+                "sql": sql,
+                "many": many,
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+            })
+
+
+class RequestProfilingMiddleware:
+    """Write a cProfile dump and SQL log for requests that ask for it or are sampled."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        """Store the next handler, or drop out of the chain when profiling is disabled."""
+        if not settings.REQUEST_PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = Path(settings.REQUEST_PROFILING_DIR)
+        self.header = settings.REQUEST_PROFILING_HEADER
+        self.token = settings.REQUEST_PROFILING_TOKEN
+        self.sample_rate = settings.REQUEST_PROFILING_SAMPLE_RATE
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Handle the request, profiling it if it is selected and no other profile is running."""
+        if not self.should_profile(request) or not _profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            _profiler_lock.release()
+
+    def should_profile(self, request: HttpRequest) -> bool:
+        """Return whether the request carries the profiling token or is sampled."""
+        requested = request.headers.get(self.header)
+        if requested is not None and self.token and constant_time_compare(requested, self.token):
+            return True
+        return random.random() < self.sample_rate  # noqa: S311 - sampling, not security
+
+    def profile(self, request: HttpRequest) -> HttpResponse:
+        """Run the rest of the chain under cProfile and write the results."""
+        query_log = _QueryLog()
+        profiler = cProfile.Profile()
+        started_at = timezone.now()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(query_log))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "unmatched"
+        safe_name = re.sub(r"[^\w.-]+", "_", view_name)
+        profile_id = f"{started_at:%Y%m%dT%H%M%S}-{safe_name}-{uuid.uuid4().hex[:8]}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(self.directory / f"{profile_id}.prof")
+        report = {
+            "id": profile_id,
+            "view": view_name,
+            "route": match.route if match else None,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "started_at": started_at.isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "query_count": len(query_log.queries),
+            "query_ms": round(sum(query["ms"] for query in query_log.queries), 3),
+            "queries": query_log.queries,
+        }
+        (self.directory / f"{profile_id}.json").write_text(json.dumps(report, indent=2))
+        response["X-Profile-Id"] = profile_id
+        return response
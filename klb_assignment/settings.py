@@ -9,6 +9,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "klb_assignment.metrics.MetricsMiddleware",  # outermost, so it times the whole stack
+    "klb_assignment.profiling.RequestProfilingMiddleware",  # removed from the chain unless enabled
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -50,12 +53,41 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# /metrics is served to these client addresses, or to requests sending
+# "Authorization: Bearer <METRICS_TOKEN>" (empty disables the token)
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if ip]
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Per-request cProfile dumps and SQL logs (see klb_assignment/profiling.py). A request is
+# profiled when it sends REQUEST_PROFILING_HEADER with the token, or by sampling.
+REQUEST_PROFILING_ENABLED = os.getenv("REQUEST_PROFILING_ENABLED") == "1"
+REQUEST_PROFILING_DIR = Path(os.getenv("REQUEST_PROFILING_DIR", str(BASE_DIR / "profiles")))
+REQUEST_PROFILING_HEADER = "X-Profile-Request"
+REQUEST_PROFILING_TOKEN = os.getenv("REQUEST_PROFILING_TOKEN", "")  # empty disables the header trigger
+REQUEST_PROFILING_SAMPLE_RATE = float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0"))  # 0.0 - 1.0
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
+    ),
+    # orjson-backed JSON, falling back to the stdlib when orjson is not installed
+    "DEFAULT_RENDERER_CLASSES": (
+        "users.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "users.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
 }
 
+# In-process cache of users resolved from JWTs. Other processes only see a
+# deactivated or deleted user once their entry expires, so the TTL bounds
+# how long a disabled account keeps working.
+AUTH_USER_CACHE_SIZE = 1024  # users kept per process
+AUTH_USER_CACHE_TTL = 60  # seconds before a cached user is reloaded
+
 ROOT_URLCONF = "klb_assignment.urls"
 
 TEMPLATES = [
@@ -86,7 +118,82 @@ DATABASES = {
     },
 }
 
+# Production profile for SQLite, enabled with DJANGO_DB_PROFILE=production:
+# persistent connections, a busy timeout, BEGIN IMMEDIATE so writers queue on
+# the busy timeout instead of failing lock upgrades, and the pragmas applied
+# by klb_assignment.db to every new connection.
+SQLITE_PRODUCTION_PROFILE = {
+    "CONN_MAX_AGE": 600,
+    "CONN_HEALTH_CHECKS": True,
+    "OPTIONS": {
+        "timeout": 20,  # seconds to wait for a lock
+        "transaction_mode": "IMMEDIATE",
+    },
+    "PRAGMAS": {
+        "journal_mode": "wal",
+        "synchronous": "normal",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # negative means KiB
+        "temp_store": "memory",
+    },
+}
+
+if os.getenv("DJANGO_DB_PROFILE") == "production":
+    DATABASES["default"].update(SQLITE_PRODUCTION_PROFILE)
+
+# Optional sharding of TelegramUser across TELEGRAM_USER_SHARD_COUNT SQLite files,
+# routed by a hash of telegram_id (users.routers). Migrate each shard with
+# `python manage.py migrate --database telegram_<n>`.
+TELEGRAM_USER_SHARDS = [f"telegram_{n}" for n in range(int(os.getenv("TELEGRAM_USER_SHARD_COUNT", "0")))]
+DATABASES.update({alias: {**DATABASES["default"], "NAME": BASE_DIR / f"{alias}.sqlite3"} for alias in TELEGRAM_USER_SHARDS})
+DATABASE_ROUTERS = ["users.routers.TelegramUserShardRouter"] if TELEGRAM_USER_SHARDS else []
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+# Celery task durations are recorded by the workers and served by the web
+# processes' /metrics, so they go through a cache both can reach. The file
+# cache is enough on one host (but may lose increments under load); point it
+# at Redis with METRICS_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# and METRICS_CACHE_LOCATION=redis://... otherwise.
+METRICS_CACHE_ALIAS = "metrics"
+CACHES[METRICS_CACHE_ALIAS] = {
+    "BACKEND": os.getenv("METRICS_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+    "LOCATION": os.getenv("METRICS_CACHE_LOCATION", str(BASE_DIR / ".metrics")),
+    "TIMEOUT": None,
+}
+if CACHES[METRICS_CACHE_ALIAS]["BACKEND"].endswith(".FileBasedCache"):
+    CACHES[METRICS_CACHE_ALIAS]["OPTIONS"] = {"MAX_ENTRIES": 100_000}  # it culls beyond 300 by default
+
+# Serialized profiles served with ETags by ProfileView
+PROFILE_CACHE_ALIAS = "default"
+PROFILE_CACHE_TIMEOUT = 300  # seconds
+
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+WELCOME_EMAIL_BATCH_SIZE = 100  # messages handed to the mail backend at once
+WELCOME_EMAIL_RELAY_BATCH_SIZE = 500  # outbox rows per send_welcome_emails task
+WELCOME_EMAIL_RETRY_DELAY = 30  # seconds before the first retry of a failed send, doubled each time
+
+# Bulk Telegram registration limits
+TELEGRAM_BULK_MAX_ITEMS = 1000  # payloads accepted per request
+TELEGRAM_BULK_CHUNK_SIZE = 500  # rows per upsert statement
+TELEGRAM_EXPORT_CHUNK_SIZE = 2000  # rows per keyset page when streaming exports
+
+# Last-seen/interaction tracking, buffered per process and written in bulk
+TELEGRAM_ACTIVITY_MAX_PENDING = 1000  # users buffered before a flush
+TELEGRAM_ACTIVITY_FLUSH_INTERVAL = 10.0  # seconds before buffered touches are flushed
+TELEGRAM_ACTIVITY_BATCH_SIZE = 500  # users per UPDATE statement
+
+# Repeated /start registrations are answered from the cache (see users/idempotency.py)
+TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS = "default"
+TELEGRAM_REGISTER_DEDUP_TTL = 10  # seconds a successful response is replayed
+TELEGRAM_REGISTER_INFLIGHT_TIMEOUT = 30  # seconds a claim survives a worker that died mid-request
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -107,6 +214,51 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# DJANGO_PASSWORD_HASHER picks the hasher for new hashes; the others stay listed
+# so existing hashes still verify and are upgraded on the user's next login.
+# `python manage.py calibrate_password_hasher` recommends parameters for this host.
+
+PASSWORD_HASHER = os.getenv("DJANGO_PASSWORD_HASHER", "pbkdf2")
+
+PASSWORD_HASHER_PARAMS = {
+    "pbkdf2": {
+        "iterations": int(os.getenv("PBKDF2_ITERATIONS", "1000000")),
+    },
+    "scrypt": {
+        "work_factor": int(os.getenv("SCRYPT_WORK_FACTOR", str(2**14))),
+        "block_size": int(os.getenv("SCRYPT_BLOCK_SIZE", "8")),
+        "parallelism": int(os.getenv("SCRYPT_PARALLELISM", "5")),
+    },
+    "argon2": {
+        "time_cost": int(os.getenv("ARGON2_TIME_COST", "2")),
+        "memory_cost": int(os.getenv("ARGON2_MEMORY_COST", "102400")),  # KiB
+        "parallelism": int(os.getenv("ARGON2_PARALLELISM", "8")),
+    },
+}
+
+_PASSWORD_HASHER_CLASSES = {
+    "pbkdf2": "users.hashers.TunedPBKDF2PasswordHasher",
+    "scrypt": "users.hashers.TunedScryptPasswordHasher",
+    "argon2": "users.hashers.TunedArgon2PasswordHasher",  # requires argon2-cffi
+}
+
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHER_CLASSES[PASSWORD_HASHER],
+    *(path for name, path in _PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER),
+]
+
+# Threads hashing passwords for the async registration view
+PASSWORD_HASH_WORKERS = 4
+
+# Processes hashing passwords during bulk user provisioning
+PASSWORD_PROVISION_WORKERS = int(os.getenv("PASSWORD_PROVISION_WORKERS", str(os.cpu_count() or 1)))
+# Accounts accepted per provisioning request; at tuned hasher cost (~0.25s per hash)
+# 100 accounts fit a 30s request timeout on 2 cores. Use provision_users for more.
+USER_PROVISION_MAX_ITEMS = int(os.getenv("USER_PROVISION_MAX_ITEMS", "100"))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -133,3 +285,9 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 CELERY_BROKER_URL = "redis://localhost:6379/0"
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
+CELERY_BEAT_SCHEDULE = {
+    "relay-welcome-emails": {
+        "task": "users.tasks.relay_welcome_emails",
+        "schedule": 5.0,  # seconds
+    },
+}
@@ -0,0 +1,25 @@
+"""Lean settings for Celery worker and bot processes.
+
+Select with ``DJANGO_SETTINGS_MODULE=klb_assignment.settings_worker``. It keeps
+the database, cache, email and Celery configuration of ``settings`` but loads
+only the apps that tasks touch and no URLconf, so ``django.setup()`` and
+Celery's startup system checks skip the admin, sessions, messages, DRF and
+every view module. Check it with ``python manage.py startup_report``.
+"""
+
+from .settings import *  # noqa: F403
+from .settings import TEMPLATES
+
+INSTALLED_APPS = [
+    "django.contrib.auth",  # User model, used by the users app signals
+    "django.contrib.contenttypes",  # required by auth
+    "users",  # tasks, models and the welcome email template
+]
+
+MIDDLEWARE = []
+
+# Workers serve no HTTP; an empty URLconf keeps the URL checks from importing every view
+ROOT_URLCONF = "klb_assignment.urls_worker"
+
+# Templates are only rendered outside requests, so no context processors are needed
+TEMPLATES = [{**TEMPLATES[0], "OPTIONS": {}}]
@@ -0,0 +1,3 @@
+"""Empty URL configuration for worker processes (see ``settings_worker``)."""
+
+urlpatterns = []
@@ -13,3 +13,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "klb_assignment.settings")
 
 application = get_wsgi_application()
+
+# Imported after setup: write buffered Telegram activity while idle and on shutdown
+from users.activity import start_flusher  # noqa: E402
+
+start_flusher()
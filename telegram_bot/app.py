@@ -1,6 +1,8 @@
 """Telegram Bot to register users in a Django application via API."""
 
+import asyncio
 import logging
+import os
 from os import getenv
 
 import httpx
@@ -8,19 +10,43 @@ from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
+from telegram_bot.batcher import RegistrationBatcher
+
 load_dotenv()
 
 # Load env vars
 BOT_TOKEN = getenv("TELEGRAM_BOT_TOKEN")
-API_URL = "http://localhost:8000/api/telegram/register/"
+API_URL = "http://localhost:8000/api/telegram/register/bulk/"
+
+# Registrations are flushed once this many are pending or the oldest has waited this long
+REGISTER_BATCH_SIZE = int(getenv("REGISTER_BATCH_SIZE", "100"))
+REGISTER_BATCH_LATENCY = float(getenv("REGISTER_BATCH_LATENCY", "0.5"))
+HTTP_MAX_CONNECTIONS = int(getenv("HTTP_MAX_CONNECTIONS", "10"))
+
+# Registration path: "http" (POST to Django, default) or "inprocess" (Django's ORM in this process)
+BOT_REGISTER_MODE = getenv("BOT_REGISTER_MODE", "http")
+BOT_DJANGO_SETTINGS = getenv("BOT_DJANGO_SETTINGS", "klb_assignment.settings_worker")
+
+# Update handling: "polling" (default) or "webhook"
+BOT_MODE = getenv("BOT_MODE", "polling")
+BOT_CONCURRENT_UPDATES = int(getenv("BOT_CONCURRENT_UPDATES", "32"))  # handlers running at once
+BOT_CONNECTION_POOL_SIZE = int(getenv("BOT_CONNECTION_POOL_SIZE", "64"))  # sockets to the Bot API
+
+# Webhook mode: Telegram POSTs updates to WEBHOOK_URL, served locally on WEBHOOK_LISTEN:WEBHOOK_PORT
+WEBHOOK_URL = getenv("WEBHOOK_URL")
+WEBHOOK_PATH = getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_LISTEN = getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = getenv("WEBHOOK_SECRET")
+WEBHOOK_MAX_PENDING = int(getenv("WEBHOOK_MAX_PENDING", "1000"))
 
 # Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # /start command
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None: # noqa: ARG001
-    """Handle the /start command and register the user in Django."""
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the /start command and queue the user for registration in Django."""
     user = update.effective_user
 
     payload = {
@@ -30,21 +56,89 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None: # n
         "last_name": user.last_name,
         "language_code": user.language_code,
     }
-
-    try:
-        async with httpx.AsyncClient() as client:
-            await client.post(API_URL, json=payload)
-    except Exception: # noqa: BLE001
-        logger.error("Failed to POST to Django") # noqa: TRY400
+    # Django's serializer rejects nulls for these optional fields
+    context.bot_data["registrations"].submit({key: value for key, value in payload.items() if value is not None})
 
     await update.message.reply_text(f"Hi, welcome! {user.username}")
 
+# Lifecycle
+def setup_django() -> None:
+    """Configure Django so registrations can be saved in this process."""
+    # Imported here so the default HTTP mode does not load Django at all
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", BOT_DJANGO_SETTINGS)
+    django.setup()
+
+async def post_init(application: Application) -> None:
+    """Start the registration batcher, with a pooled HTTP client in HTTP mode."""
+    if BOT_REGISTER_MODE == "inprocess":
+        from telegram_bot.inprocess import InProcessRegistrationBatcher
+
+        batcher = InProcessRegistrationBatcher(max_batch_size=REGISTER_BATCH_SIZE, max_latency=REGISTER_BATCH_LATENCY)
+    else:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+        )
+        batcher = RegistrationBatcher(
+            client,
+            API_URL,
+            max_batch_size=REGISTER_BATCH_SIZE,
+            max_latency=REGISTER_BATCH_LATENCY,
+        )
+    batcher.start()
+    application.bot_data["registrations"] = batcher
+
+async def post_shutdown(application: Application) -> None:
+    """Flush pending registrations and close the pooled HTTP client."""
+    batcher = application.bot_data.pop("registrations")
+    await batcher.stop()
+    if batcher.client is not None:
+        await batcher.client.aclose()
+
+async def run_webhook(app: Application) -> None:
+    """Register the webhook with Telegram and serve updates until interrupted."""
+    # Imported here so polling bots do not pay for the ASGI server at startup
+    import uvicorn
+
+    from telegram_bot.webhook import WebhookApp
+
+    receiver = WebhookApp(app, path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET, max_pending=WEBHOOK_MAX_PENDING)
+    server = uvicorn.Server(uvicorn.Config(receiver, host=WEBHOOK_LISTEN, port=WEBHOOK_PORT, lifespan="off"))
+    async with app:
+        await post_init(app)
+        await app.start()
+        await app.bot.set_webhook(
+            WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET,
+            max_connections=min(BOT_CONCURRENT_UPDATES, 100),
+            allowed_updates=Update.ALL_TYPES,
+        )
+        try:
+            await server.serve()
+        finally:
+            await app.stop()
+            await post_shutdown(app)
+
 # Main
 def main() -> None:
     """Start the bot."""
-    app = Application.builder().token(BOT_TOKEN).build()
+    if BOT_REGISTER_MODE == "inprocess":
+        setup_django()
+    app = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(BOT_CONCURRENT_UPDATES)
+        .connection_pool_size(BOT_CONNECTION_POOL_SIZE)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     app.add_handler(CommandHandler("start", start))
-    app.run_polling()
+    if BOT_MODE == "webhook":
+        asyncio.run(run_webhook(app))
+    else:
+        app.run_polling()
 
 if __name__ == "__main__":
     main()
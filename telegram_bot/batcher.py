@@ -0,0 +1,99 @@
+"""Write-behind batching of Telegram user registrations."""
+
+import asyncio
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class RegistrationBatcher:
+    """Coalesce registration payloads and POST them to Django in batches.
+
+    ``submit`` only queues the payload, so handlers can reply to the user
+    right away. A background task flushes the queue to the bulk endpoint once
+    ``max_batch_size`` payloads are pending or ``max_latency`` seconds have
+    passed since the first of them arrived.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient | None,
+        url: str | None,
+        *,
+        max_batch_size: int = 100,
+        max_latency: float = 0.5,
+        max_pending: int = 10_000,
+    ) -> None:
+        """Initialize the batcher around a shared HTTP client."""
+        self.client = client
+        self.url = url
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._worker: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Start the background flush task on the running event loop."""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush everything still queued and stop the background task."""
+        if self._worker is None:
+            return
+        await self._queue.put(_STOP)
+        await self._worker
+        self._worker = None
+
+    def submit(self, payload: dict) -> bool:
+        """Queue a registration payload; return False if the queue is full."""
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            logger.warning("Registration queue full, dropping telegram_id=%s", payload.get("telegram_id"))
+            return False
+        return True
+
+    async def _run(self) -> None:
+        """Collect payloads into batches and flush them until stopped."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            payload = await self._queue.get()
+            if payload is _STOP:
+                break
+            batch = [payload]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                try:
+                    payload = await asyncio.wait_for(self._queue.get(), deadline - loop.time())
+                except TimeoutError:
+                    break
+                if payload is _STOP:
+                    stopping = True
+                    break
+                batch.append(payload)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]) -> None:
+        """Save one batch, logging failures and rejected items.
+
+        Any error is logged and the batch dropped, so one bad response cannot
+        stop the background task.
+        """
+        try:
+            for result in await self._send(batch):
+                if result.get("status") == "invalid":
+                    logger.warning("Django rejected registration %s: %s", batch[result["index"]], result.get("errors"))
+        except Exception:
+            logger.exception("Failed to save %d registrations in Django", len(batch))
+
+    async def _send(self, batch: list[dict]) -> list[dict]:
+        """POST one batch to the bulk endpoint and return its per-item results."""
+        response = await self.client.post(self.url, json=batch)
+        response.raise_for_status()
+        return response.json().get("results", [])
@@ -0,0 +1,38 @@
+"""In-process registration: the bot saves users through Django's ORM, skipping the HTTP loopback.
+
+Call ``setup_django`` before importing this module, since it imports Django models.
+"""
+
+from asgiref.sync import sync_to_async
+
+from telegram_bot.batcher import RegistrationBatcher
+from users.activity import flush_activity, start_flusher
+from users.registration import aregister_telegram_users
+
+
+class InProcessRegistrationBatcher(RegistrationBatcher):
+    """RegistrationBatcher that hands each batch to ``register_telegram_users`` directly.
+
+    Validation and upserts are the ones behind ``/api/telegram/register/bulk/``;
+    only the HTTP request, middleware and JSON round trip are gone. The users'
+    activity is buffered in this process, so the batcher also runs its
+    background flush and writes what is left when it stops (``post_shutdown``).
+    """
+
+    def __init__(self, *, max_batch_size: int = 100, max_latency: float = 0.5, max_pending: int = 10_000) -> None:
+        """Initialize the batcher without an HTTP client."""
+        super().__init__(None, None, max_batch_size=max_batch_size, max_latency=max_latency, max_pending=max_pending)
+
+    def start(self) -> None:
+        """Start the batch worker and the activity flush thread."""
+        super().start()
+        start_flusher()
+
+    async def stop(self) -> None:
+        """Save everything still queued, then flush the activity it recorded."""
+        await super().stop()
+        await sync_to_async(flush_activity)()
+
+    async def _send(self, batch: list[dict]) -> list[dict]:
+        """Register one batch in this process and return its per-item results."""
+        return (await aregister_telegram_users(batch))["results"]
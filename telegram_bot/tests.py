@@ -0,0 +1,185 @@
+"""Test cases for the telegram_bot package."""
+
+import asyncio
+import json
+from unittest import IsolatedAsyncioTestCase, mock
+
+import httpx
+from django.test import TestCase
+from telegram import Update
+from telegram.ext import Application
+
+from telegram_bot.batcher import RegistrationBatcher
+from telegram_bot.inprocess import InProcessRegistrationBatcher
+from telegram_bot.webhook import WebhookApp
+from users.activity import activity
+from users.models import TelegramUser
+
+BULK_URL = "http://testserver/api/telegram/register/bulk/"
+
+
+class RegistrationBatcherTest(IsolatedAsyncioTestCase):
+    """Tests for the RegistrationBatcher write-behind queue."""
+
+    async def asyncSetUp(self) -> None:
+        """Set up a pooled client backed by a fake Django endpoint."""
+        self.batches = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            batch = json.loads(request.content)
+            self.batches.append(batch)
+            results = [{"index": i, "status": "created"} for i in range(len(batch))]
+            return httpx.Response(200, json={"saved": len(batch), "results": results})
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def asyncTearDown(self) -> None:
+        """Close the client."""
+        await self.client.aclose()
+
+    async def test_flushes_full_batches(self) -> None:
+        """Test that payloads are coalesced up to the batch size."""
+        batcher = RegistrationBatcher(self.client, BULK_URL, max_batch_size=3, max_latency=10)
+        batcher.start()
+        for telegram_id in range(7):
+            assert batcher.submit({"telegram_id": telegram_id})
+        await batcher.stop()
+        assert [len(batch) for batch in self.batches] == [3, 3, 1]
+
+    async def test_flushes_after_latency(self) -> None:
+        """Test that a partial batch is flushed once the latency window passes."""
+        batcher = RegistrationBatcher(self.client, BULK_URL, max_batch_size=100, max_latency=0.01)
+        batcher.start()
+        batcher.submit({"telegram_id": 1})
+        await asyncio.sleep(0.1)
+        assert self.batches == [[{"telegram_id": 1}]]
+        await batcher.stop()
+
+    async def test_bad_response_does_not_stop_worker(self) -> None:
+        """Test that a batch whose response cannot be read is logged and later batches still flush."""
+        responses = iter([
+            httpx.Response(200, content=b"<html>Bad gateway</html>"),
+            httpx.Response(200, json={"results": [{"index": 5, "status": "invalid"}]}),
+            httpx.Response(200, json={"results": []}),
+        ])
+        client = httpx.AsyncClient(transport=httpx.MockTransport(lambda _: next(responses)))
+        self.addAsyncCleanup(client.aclose)
+        batcher = RegistrationBatcher(client, BULK_URL, max_batch_size=1, max_latency=10)
+        batcher.start()
+        for telegram_id in range(3):
+            batcher.submit({"telegram_id": telegram_id})
+        with self.assertLogs("telegram_bot.batcher", "ERROR") as logs:
+            await batcher.stop()
+        assert len(logs.records) == 2  # noqa: PLR2004
+        assert next(responses, None) is None
+
+    async def test_submit_when_full(self) -> None:
+        """Test that submit refuses payloads once the queue is full."""
+        batcher = RegistrationBatcher(self.client, BULK_URL, max_pending=1)
+        assert batcher.submit({"telegram_id": 1})
+        assert not batcher.submit({"telegram_id": 2})
+
+
+class InProcessRegistrationBatcherTest(TestCase):
+    """Tests for the batcher that saves registrations through the ORM."""
+
+    def setUp(self) -> None:
+        """Start from an empty activity buffer, without a background flush thread."""
+        activity.clear()
+        patcher = mock.patch("telegram_bot.inprocess.start_flusher")
+        self.start_flusher = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_saves_batches_without_http(self) -> None:
+        """Test that batches are upserted and their users touched."""
+        batcher = InProcessRegistrationBatcher(max_batch_size=2, max_latency=10)
+        batcher.start()
+        for telegram_id in (1, 2, 3):
+            batcher.submit({"telegram_id": telegram_id, "username": f"user{telegram_id}"})
+        await batcher.stop()
+        users = [user async for user in TelegramUser.objects.order_by("telegram_id")]
+        assert [user.username for user in users] == ["user1", "user2", "user3"]
+        assert [user.interaction_count for user in users] == [1, 1, 1]
+
+    async def test_logs_rejected_items(self) -> None:
+        """Test that invalid items are logged and the valid ones still saved."""
+        batcher = InProcessRegistrationBatcher(max_latency=10)
+        batcher.start()
+        batcher.submit({"telegram_id": "not a number"})
+        batcher.submit({"telegram_id": 4})
+        with self.assertLogs("telegram_bot.batcher", "WARNING") as logs:
+            await batcher.stop()
+        assert "not a number" in logs.output[0]
+        assert await TelegramUser.objects.filter(telegram_id=4).aexists()
+
+    async def test_stop_flushes_activity(self) -> None:
+        """Test that the batcher starts the activity flusher and flushes the buffer when stopped."""
+        batcher = InProcessRegistrationBatcher(max_latency=10)
+        batcher.start()
+        batcher.submit({"telegram_id": 5})
+        await batcher.stop()
+        self.start_flusher.assert_called_once()
+        assert len(activity) == 0
+        assert (await TelegramUser.objects.aget(telegram_id=5)).interaction_count == 1
+
+
+def start_update(update_id: int) -> dict:
+    """Return a /start update as Telegram would POST it."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 5, "type": "private"},
+            "from": {"id": 5, "is_bot": False, "first_name": "Tele", "username": "gram"},
+            "text": "/start",
+        },
+    }
+
+
+class WebhookAppTest(IsolatedAsyncioTestCase):
+    """Tests for the WebhookApp receiver, driven by a fake Telegram sender."""
+
+    async def asyncSetUp(self) -> None:
+        """Set up an application and a client posting to the receiver."""
+        self.application = Application.builder().token("123456:TEST").build()
+        receiver = WebhookApp(self.application, path="/telegram", secret_token="s3cret", max_pending=3)  # noqa: S106
+        self.telegram = httpx.AsyncClient(transport=httpx.ASGITransport(app=receiver), base_url="http://bot")
+        self.headers = {"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+
+    async def asyncTearDown(self) -> None:
+        """Close the fake sender."""
+        await self.telegram.aclose()
+
+    async def test_updates_are_queued(self) -> None:
+        """Test that posted updates land on the application's update queue."""
+        for update_id in range(3):
+            response = await self.telegram.post("/telegram", json=start_update(update_id), headers=self.headers)
+            assert response.status_code == 200  # noqa: PLR2004
+        assert self.application.update_queue.qsize() == 3  # noqa: PLR2004
+        update = self.application.update_queue.get_nowait()
+        assert isinstance(update, Update)
+        assert update.message.text == "/start"
+        assert update.effective_user.username == "gram"
+
+    async def test_backlog_limit(self) -> None:
+        """Test that the receiver sheds load once max_pending updates are queued."""
+        for update_id in range(3):
+            await self.telegram.post("/telegram", json=start_update(update_id), headers=self.headers)
+        response = await self.telegram.post("/telegram", json=start_update(3), headers=self.headers)
+        assert response.status_code == 503  # noqa: PLR2004
+
+    async def test_rejects_bad_requests(self) -> None:
+        """Test secret token, path, method and body checks."""
+        response = await self.telegram.post("/telegram", json=start_update(1), headers={"X-Telegram-Bot-Api-Secret-Token": "x"})
+        assert response.status_code == 403  # noqa: PLR2004
+        for token in (b"\xff\xfe", "sécret".encode()):
+            response = await self.telegram.post("/telegram", json=start_update(1), headers={"X-Telegram-Bot-Api-Secret-Token": token})
+            assert response.status_code == 403  # noqa: PLR2004
+        response = await self.telegram.post("/other", json=start_update(1), headers=self.headers)
+        assert response.status_code == 404  # noqa: PLR2004
+        response = await self.telegram.get("/telegram", headers=self.headers)
+        assert response.status_code == 405  # noqa: PLR2004
+        response = await self.telegram.post("/telegram", content=b"{not json", headers=self.headers)
+        assert response.status_code == 400  # noqa: PLR2004
+        assert self.application.update_queue.empty()
@@ -0,0 +1,87 @@
+"""ASGI receiver that feeds Telegram webhook updates into the bot."""
+
+import hmac
+import json
+import logging
+from collections.abc import Awaitable, Callable
+
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+Receive = Callable[[], Awaitable[dict]]
+Send = Callable[[dict], Awaitable[None]]
+
+
+class WebhookApp:
+    """Minimal ASGI app accepting Telegram webhook POSTs.
+
+    Each update is decoded onto ``application.update_queue`` and answered
+    right away; how many updates run at once is bounded by the application's
+    ``concurrent_updates`` setting. Once ``max_pending`` updates are waiting
+    the receiver answers 503, so Telegram backs off and redelivers later.
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        *,
+        path: str = "/telegram",
+        secret_token: str | None = None,
+        max_pending: int = 1000,
+    ) -> None:
+        """Initialize the receiver for ``application``."""
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.max_pending = max_pending
+
+    async def __call__(self, scope: dict, receive: Receive, send: Send) -> None:
+        """Handle one ASGI connection."""
+        if scope["type"] != "http":
+            return
+        if scope["path"] != self.path:
+            await self._respond(send, 404)
+            return
+        if scope["method"] != "POST":
+            await self._respond(send, 405)
+            return
+
+        if self.secret_token is not None:
+            # Compared as bytes, so non-ASCII or undecodable headers are a 403 rather than an error
+            received = dict(scope["headers"]).get(b"x-telegram-bot-api-secret-token", b"")
+            if not hmac.compare_digest(received, self.secret_token.encode()):
+                await self._respond(send, 403)
+                return
+
+        if self.application.update_queue.qsize() >= self.max_pending:
+            logger.warning("Webhook backlog full (%d updates), asking Telegram to retry", self.max_pending)
+            await self._respond(send, 503)
+            return
+
+        try:
+            update = Update.de_json(json.loads(await self._read_body(receive)), self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            await self._respond(send, 400)
+            return
+
+        await self.application.update_queue.put(update)
+        await self._respond(send, 200)
+
+    @staticmethod
+    async def _read_body(receive: Receive) -> bytes:
+        """Read the full request body."""
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        return body
+
+    @staticmethod
+    async def _respond(send: Send, status: int) -> None:
+        """Send an empty response with ``status``."""
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-length", b"0")]})
+        await send({"type": "http.response.body", "body": b""})
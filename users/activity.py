@@ -0,0 +1,129 @@
+"""Coalesced last-seen and interaction tracking for Telegram users.
+
+Views record touches in a per-process buffer; the buffer is written with
+``TelegramUserQuerySet.add_activity`` once it holds enough users or its
+oldest touch is old enough, so many touches cost one UPDATE. Processes that
+serve touches call ``start_flusher`` so that an idle buffer is still written
+every ``TELEGRAM_ACTIVITY_FLUSH_INTERVAL`` and once more at interpreter exit.
+Touches not yet flushed are lost if the process is killed, which is
+acceptable for engagement data.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from datetime import datetime
+from functools import cache
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from .models import TelegramUser
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityBuffer:
+    """Thread-safe buffer of ``telegram_id -> (interactions, last seen)``."""
+
+    def __init__(self, max_pending: int, flush_interval: float) -> None:
+        """Initialize an empty buffer."""
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self._touches: dict[int, tuple[int, datetime]] = {}
+        self._first_touch = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of users with pending touches."""
+        return len(self._touches)
+
+    def touch(self, telegram_ids: Iterable[int], at: datetime | None = None) -> bool:
+        """Record one interaction per id (repeats count) and return whether a flush is due."""
+        at = at or timezone.now()
+        with self._lock:
+            if not self._touches:
+                self._first_touch = time.monotonic()
+            for telegram_id in telegram_ids:
+                count, _ = self._touches.get(telegram_id, (0, at))
+                self._touches[telegram_id] = (count + 1, at)
+            return (
+                len(self._touches) >= self.max_pending
+                or time.monotonic() - self._first_touch >= self.flush_interval
+            )
+
+    def flush(self) -> int:
+        """Write pending touches in bulk and return the number of rows updated.
+
+        If the write fails, the touches are merged back and retried after
+        another ``flush_interval``.
+        """
+        with self._lock:
+            touches, self._touches = self._touches, {}
+        if not touches:
+            return 0
+        try:
+            return TelegramUser.objects.add_activity(touches, batch_size=settings.TELEGRAM_ACTIVITY_BATCH_SIZE)
+        except DatabaseError:
+            with self._lock:
+                for telegram_id, (count, seen) in touches.items():
+                    pending, latest = self._touches.get(telegram_id, (0, seen))
+                    self._touches[telegram_id] = (count + pending, max(seen, latest))
+                self._first_touch = time.monotonic()
+            raise
+
+    def clear(self) -> None:
+        """Drop pending touches without writing them."""
+        with self._lock:
+            self._touches.clear()
+
+
+activity = ActivityBuffer(
+    max_pending=settings.TELEGRAM_ACTIVITY_MAX_PENDING,
+    flush_interval=settings.TELEGRAM_ACTIVITY_FLUSH_INTERVAL,
+)
+
+
+def flush_activity() -> None:
+    """Flush the buffer, logging a database error instead of failing the request."""
+    try:
+        activity.flush()
+    except DatabaseError:
+        logger.exception("Failed to flush Telegram user activity; will retry")
+
+
+def touch(telegram_ids: Iterable[int]) -> None:
+    """Record interactions and flush the buffer when it is due."""
+    if activity.touch(telegram_ids):
+        flush_activity()
+
+
+def _flush_periodically(interval: float) -> None:
+    """Flush pending touches every ``interval`` seconds, forever."""
+    while True:
+        time.sleep(interval)
+        if len(activity):
+            flush_activity()
+            connections.close_all()  # this thread's connections; it sleeps long enough to not reuse them
+
+
+@cache
+def start_flusher() -> threading.Thread:
+    """Start the background flush thread once per process and flush again at exit.
+
+    Called by the WSGI and ASGI entry points and the in-process bot. The exit
+    flush runs on a normal interpreter shutdown, which includes gunicorn and
+    uvicorn workers stopped with SIGTERM.
+    """
+    thread = threading.Thread(
+        target=_flush_periodically,
+        args=(activity.flush_interval,),
+        name="telegram-activity-flusher",
+        daemon=True,
+    )
+    thread.start()
+    atexit.register(flush_activity)
+    return thread
@@ -1,6 +1,44 @@
 """Admin configuration for users app."""
+from django.conf import settings
 from django.contrib import admin
+from django.db.models import QuerySet
+from django.http import HttpRequest
 
 from .models import TelegramUser
+from .pagination import EstimatedCountPaginator
 
-admin.site.register(TelegramUser)
+# Telegram IDs are stored as signed 64-bit integers
+MAX_TELEGRAM_ID = 2**63 - 1
+
+
+class TelegramUserAdmin(admin.ModelAdmin):
+    """Changelist that stays index-bound on tables with millions of Telegram users."""
+
+    list_display = ("telegram_id", "username", "first_name", "last_name", "language_code", "last_seen_at", "interaction_count")
+    readonly_fields = ("last_seen_at", "interaction_count")
+    # Matched by get_search_results: exact telegram_id, or a username prefix
+    search_fields = ("=telegram_id", "^username")
+    search_help_text = "Exact Telegram ID, or the beginning of a username (case-sensitive)."
+    ordering = ("-id",)
+    sortable_by = ("telegram_id",)  # the unindexed name columns would need a full sort
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    list_max_show_all = 200
+
+    def get_search_results(
+        self, request: HttpRequest, queryset: QuerySet[TelegramUser], search_term: str,  # noqa: ARG002
+    ) -> tuple[QuerySet[TelegramUser], bool]:
+        """Search with index seeks instead of the default ``LIKE`` scans."""
+        term = search_term.strip().removeprefix("@")
+        if not term:
+            return queryset, False
+        if term.isascii() and term.isdigit():  # int() rejects digits such as "²"
+            telegram_id = int(term)
+            return queryset.filter(telegram_id=telegram_id) if telegram_id <= MAX_TELEGRAM_ID else queryset.none(), False
+        return queryset.username_prefix(term), False
+
+
+# The changelist reads a single database, and sharded rows are not on ``default``
+if not settings.TELEGRAM_USER_SHARDS:
+    admin.site.register(TelegramUser, TelegramUserAdmin)
@@ -0,0 +1,91 @@
+"""Async (ASGI) views for the users app.
+
+These mirror ``RegisterView`` and ``TelegramRegisterView`` for deployments
+served through ``klb_assignment.asgi``: password hashing runs in a bounded
+thread pool and only work needing transactions or raw cursors goes to
+Django's sync thread, so one worker can hold many registrations. Telegram
+registration shares ``register_telegram_user`` with the sync view.
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import HttpRequest, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from .idempotency import IDEMPOTENCY_HEADER
+from .models import WelcomeEmailOutbox
+from .registration import aregister_telegram_user
+from .serializers import UserSerializer, normalize_user_data
+
+
+@cache
+def password_hash_executor() -> ThreadPoolExecutor:
+    """Return the shared pool that bounds concurrent password hashing."""
+    return ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+
+@sync_to_async
+def _save_with_welcome_email(user: User) -> None:
+    """Insert the user and its welcome-email outbox row in one transaction."""
+    with transaction.atomic():
+        user.save()
+        WelcomeEmailOutbox.objects.create(email=user.email)
+
+
+def _parse_json(request: HttpRequest) -> object:
+    """Decode a JSON request body, returning None if it is malformed."""
+    try:
+        return json.loads(request.body)
+    except ValueError:
+        return None
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncRegisterView(View):
+    """Async view to handle user registration."""
+
+    async def post(self, request: HttpRequest) -> JsonResponse:
+        """Register a new user."""
+        data = _parse_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = UserSerializer(data=data)
+        # Unique-username validation queries the database
+        if not await sync_to_async(serializer.is_valid)():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = normalize_user_data(dict(serializer.validated_data))
+        password = validated_data.pop("password")
+        user = User(**validated_data)
+
+        loop = asyncio.get_running_loop()
+        user.password = await loop.run_in_executor(password_hash_executor(), make_password, password)
+        # The async ORM has no transactions, so the atomic insert runs in a thread
+        await _save_with_welcome_email(user)
+        return JsonResponse(UserSerializer(user).data, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncTelegramRegisterView(View):
+    """Async view to handle registration or update of Telegram users."""
+
+    async def post(self, request: HttpRequest) -> JsonResponse:
+        """Register or update a Telegram user (see ``register_telegram_user``)."""
+        data = _parse_json(request)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Invalid JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+
+        outcome = await aregister_telegram_user(data, request.headers.get(IDEMPOTENCY_HEADER))
+        return JsonResponse(outcome.data, status=outcome.status, headers=outcome.headers)
@@ -0,0 +1,44 @@
+"""Authentication classes for the users app."""
+
+import copy
+
+from django.contrib.auth.models import AbstractBaseUser
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .caching import user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that resolves users through an in-process TTL/LRU cache.
+
+    Inactive or missing users are never cached. Saving or deleting a user
+    drops its entry (see ``users.signals``), but only in the process that
+    did it: other workers keep accepting a deactivated or deleted user for
+    up to ``AUTH_USER_CACHE_TTL`` seconds, and ``QuerySet.update()`` or raw
+    SQL, which send no signals, leave every process stale for that long.
+    Password changes are caught at once when ``CHECK_REVOKE_TOKEN`` is on.
+    """
+
+    def get_user(self, validated_token: Token) -> AbstractBaseUser:
+        """Return the token's user, hitting the database only on a cache miss."""
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = str(user_id)
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM,
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        # Hand out a copy so per-request changes never leak into the cache
+        return copy.copy(user)
@@ -0,0 +1,69 @@
+"""In-process caches for frequently read user data."""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class TTLCache:
+    """Thread-safe LRU cache bounded in size, whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        """Initialize an empty cache."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of entries, including expired ones not yet evicted."""
+        return len(self._data)
+
+    def get(self, key: Hashable) -> object | None:
+        """Return the cached value for ``key``, or None if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: object) -> None:
+        """Store ``value`` under ``key``, evicting the least recently used entries."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Drop ``key`` from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._data.clear()
+
+
+# Users resolved from JWTs, keyed by str(user id)
+user_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+def profile_cache_key(user_id: object) -> str:
+    """Return the cache key of a user's serialized profile."""
+    return f"users:profile:{user_id}"
+
+
+def invalidate_profile(user_id: object) -> None:
+    """Drop a user's serialized profile from the profile cache."""
+    caches[settings.PROFILE_CACHE_ALIAS].delete(profile_cache_key(user_id))
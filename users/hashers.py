@@ -0,0 +1,135 @@
+"""Password hashers whose cost parameters come from settings.
+
+Each hasher keeps its stock algorithm name, so hashes it produced earlier
+still verify, and reads its parameters from ``PASSWORD_HASHER_PARAMS``.
+When the parameters (or the preferred hasher) change, ``must_update``
+reports older hashes and Django re-hashes the password on the user's next
+successful login.
+"""
+
+import base64
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+from itertools import repeat
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+    get_hashers,
+    get_hashers_by_algorithm,
+    make_password,
+)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with a configurable iteration count."""
+
+    @property
+    def iterations(self) -> int:
+        """Return ``PASSWORD_HASHER_PARAMS["pbkdf2"]["iterations"]``."""
+        return settings.PASSWORD_HASHER_PARAMS["pbkdf2"]["iterations"]
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with configurable work factor, block size and parallelism."""
+
+    @property
+    def work_factor(self) -> int:
+        """Return the CPU/memory cost ``N``."""
+        return settings.PASSWORD_HASHER_PARAMS["scrypt"]["work_factor"]
+
+    @property
+    def block_size(self) -> int:
+        """Return the block size ``r``."""
+        return settings.PASSWORD_HASHER_PARAMS["scrypt"]["block_size"]
+
+    @property
+    def parallelism(self) -> int:
+        """Return the parallelism ``p``."""
+        return settings.PASSWORD_HASHER_PARAMS["scrypt"]["parallelism"]
+
+    def encode(self, password: str, salt: str, n: int | None = None, r: int | None = None, p: int | None = None) -> str:
+        """Hash with the given or configured cost, allowing the memory that cost needs.
+
+        OpenSSL caps scrypt at 32 MiB by default, and ``verify`` passes the
+        cost stored in the hash, which may exceed the configured one after it
+        was lowered, so the limit follows the parameters of each call.
+        """
+        self._check_encode_args(password, salt)
+        n, r, p = n or self.work_factor, r or self.block_size, p or self.parallelism
+        hash_ = hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=2 * 128 * n * r * p, dklen=64,
+        )
+        return f"{self.algorithm}${n}${salt}${r}${p}${base64.b64encode(hash_).decode('ascii').strip()}"
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with configurable time cost, memory cost and parallelism (needs argon2-cffi)."""
+
+    @property
+    def time_cost(self) -> int:
+        """Return the number of passes."""
+        return settings.PASSWORD_HASHER_PARAMS["argon2"]["time_cost"]
+
+    @property
+    def memory_cost(self) -> int:
+        """Return the memory cost in KiB."""
+        return settings.PASSWORD_HASHER_PARAMS["argon2"]["memory_cost"]
+
+    @property
+    def parallelism(self) -> int:
+        """Return the number of lanes."""
+        return settings.PASSWORD_HASHER_PARAMS["argon2"]["parallelism"]
+
+
+def _init_hash_worker(settings_module: str) -> None:
+    """Set up Django in a hashing process."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    django.setup()
+
+
+def _hash_in_worker(password: str, hashers: list[str], params: dict) -> str:
+    """Hash one password with the parent's hasher configuration at the time of the call."""
+    if hashers != settings.PASSWORD_HASHERS:
+        settings.PASSWORD_HASHERS = hashers
+        get_hashers.cache_clear()
+        get_hashers_by_algorithm.cache_clear()
+    settings.PASSWORD_HASHER_PARAMS = params
+    return make_password(password)
+
+
+@cache
+def hash_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared pool of ``workers`` hashing processes.
+
+    Spawned rather than forked (forking a threaded server is unsafe) and kept
+    for the life of the process, so Django is imported once per worker rather
+    than once per batch.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_hash_worker,
+        initargs=(settings.SETTINGS_MODULE,),
+    )
+
+
+def hash_passwords(passwords: list[str], workers: int) -> list[str]:
+    """Hash passwords with the preferred hasher, spread across ``workers`` processes.
+
+    Batches smaller than two passwords, or ``workers <= 1``, are hashed in-process.
+    """
+    workers = min(workers, len(passwords))
+    if workers <= 1:
+        return [make_password(password) for password in passwords]
+    hashers, params = list(settings.PASSWORD_HASHERS), settings.PASSWORD_HASHER_PARAMS
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(hash_pool(workers).map(
+        _hash_in_worker, passwords, repeat(hashers), repeat(params), chunksize=chunksize,
+    ))
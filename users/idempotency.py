@@ -0,0 +1,134 @@
+"""Short-lived deduplication of repeated Telegram registrations.
+
+Users spam ``/start`` and clients retry failed POSTs, so the same
+registration often arrives many times within seconds. Each request is keyed
+by its ``telegram_id`` plus either its ``Idempotency-Key`` header or a hash
+of its payload. The first request claims the key with an atomic
+``cache.add``; duplicates are answered from the cache without touching the
+database:
+
+- while the first is still running, with 409 and ``Retry-After``
+- once it succeeded, with its stored response for ``TELEGRAM_REGISTER_DEDUP_TTL``
+- if the same ``Idempotency-Key`` comes with a different payload, with 422
+
+A payload-keyed response is only replayed while its payload is still the
+last one saved for that ``telegram_id``; otherwise A, B, A within the TTL
+would answer the second A from the cache and leave B's values stored.
+Failed requests release their key, so a retry runs again. The cache is
+``TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS``; it must be shared (e.g. Redis) for
+deduplication to span several processes.
+"""
+
+import hashlib
+import json
+from collections.abc import Callable, Iterable
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+
+IN_FLIGHT = "in-flight"
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class Outcome(NamedTuple):
+    """Status, body and extra headers of a registration response."""
+
+    status: int
+    data: dict
+    headers: dict
+
+
+def dedup_key(telegram_id: object, payload: object, idempotency_key: str | None) -> tuple[str, str]:
+    """Return the cache key of a registration and the fingerprint of its payload."""
+    fingerprint = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    scope = f"key:{idempotency_key}" if idempotency_key else f"payload:{fingerprint}"
+    digest = hashlib.sha256(f"{telegram_id}\0{scope}".encode()).hexdigest()
+    return f"users:telegram-register:{digest}", fingerprint
+
+
+def latest_key(telegram_id: object) -> str:
+    """Return the cache key of the fingerprint last saved for ``telegram_id``."""
+    digest = hashlib.sha256(str(telegram_id).encode()).hexdigest()
+    return f"users:telegram-register:latest:{digest}"
+
+
+def claim(key: str, fingerprint: str, latest: str | None = None) -> Outcome | None:
+    """Claim ``key`` for this request, or return the response owed to a duplicate.
+
+    With ``latest``, a stored response is only replayed if ``fingerprint`` is
+    still the one recorded there; a superseded one is dropped and reclaimed.
+    """
+    cache = caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS]
+    entry = {"state": IN_FLIGHT, "fingerprint": fingerprint}
+    # The first add fails for a duplicate; retry in case its entry expired or was superseded
+    for _ in range(3):
+        if cache.add(key, entry, timeout=settings.TELEGRAM_REGISTER_INFLIGHT_TIMEOUT):
+            return None
+        stored = cache.get(key)
+        if stored is None:
+            continue
+        if latest is not None and stored["state"] != IN_FLIGHT and cache.get(latest) != fingerprint:
+            cache.delete(key)
+            continue
+        return _replay(stored, fingerprint)
+    return _in_progress()
+
+
+def _in_progress() -> Outcome:
+    """Return the response for a duplicate of a request that is still running."""
+    return Outcome(status.HTTP_409_CONFLICT, {"error": "A matching registration is in progress."}, {"Retry-After": "1"})
+
+
+def _replay(stored: dict, fingerprint: str) -> Outcome:
+    """Return the response for a duplicate of the request recorded in ``stored``."""
+    if stored["fingerprint"] != fingerprint:
+        return Outcome(
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            {"error": f"{IDEMPOTENCY_HEADER} was already used with a different payload."},
+            {},
+        )
+    if stored["state"] == IN_FLIGHT:
+        return _in_progress()
+    return Outcome(stored["status"], stored["data"], {REPLAYED_HEADER: "true"})
+
+
+def complete(key: str, fingerprint: str, status_code: int, data: dict, latest: str) -> None:
+    """Store a successful response for replay, or release ``key`` so a retry runs again.
+
+    A success also records ``fingerprint`` as the last payload saved under ``latest``.
+    """
+    cache = caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS]
+    if status.is_success(status_code):
+        entry = {"state": "done", "fingerprint": fingerprint, "status": status_code, "data": data}
+        cache.set_many({key: entry, latest: fingerprint}, timeout=settings.TELEGRAM_REGISTER_DEDUP_TTL)
+    else:
+        release(key)
+
+
+def release(key: str) -> None:
+    """Drop the claim on ``key`` so the next duplicate is processed."""
+    caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS].delete(key)
+
+
+def forget(telegram_ids: Iterable[object]) -> None:
+    """Stop replaying cached registrations of ``telegram_ids``, after they were saved elsewhere."""
+    caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS].delete_many([latest_key(telegram_id) for telegram_id in telegram_ids])
+
+
+def deduplicate(telegram_id: object, payload: object, idempotency_key: str | None, handler: Callable[[], tuple[int, dict]]) -> Outcome:
+    """Run ``handler`` unless the registration is a duplicate, and return the response to send."""
+    key, fingerprint = dedup_key(telegram_id, payload, idempotency_key)
+    latest = latest_key(telegram_id)
+    replay = claim(key, fingerprint, None if idempotency_key else latest)
+    if replay is not None:
+        return replay
+    try:
+        status_code, data = handler()
+    except BaseException:
+        release(key)
+        raise
+    complete(key, fingerprint, status_code, data, latest)
+    return Outcome(status_code, data, {})
@@ -0,0 +1,85 @@
+"""Compare the bot's HTTP and in-process registration paths."""
+
+import asyncio
+import json
+import time
+from contextlib import ExitStack
+
+import httpx
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandParser
+from django.urls import reverse
+
+from telegram_bot.batcher import RegistrationBatcher
+from telegram_bot.inprocess import InProcessRegistrationBatcher
+from users.management.commands.loadbench import in_process_environment
+
+MODES = ["http", "inprocess"]
+
+
+def _payload(telegram_id: int) -> dict:
+    """Return a /start registration payload like the bot's."""
+    return {"telegram_id": telegram_id, "username": f"bot{telegram_id}", "first_name": "Bench", "language_code": "en"}
+
+
+class Command(BaseCommand):
+    """Push the same registrations through both bot registration modes and report throughput as JSON."""
+
+    help = (
+        "Submit registrations through the bot's RegistrationBatcher, once POSTing to the bulk "
+        "endpoint (Django's ASGI app in-process, or --url) and once saving through the ORM in "
+        "this process (BOT_REGISTER_MODE=inprocess), and report registrations per second."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command line arguments."""
+        parser.add_argument("--registrations", type=int, default=2000, help="Registrations per mode.")
+        parser.add_argument("--batch-size", type=int, default=100, help="Registrations per flush.")
+        parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+        parser.add_argument("--url", help="Base URL of a running server for the HTTP mode.")
+        parser.add_argument(
+            "--no-test-db",
+            action="store_true",
+            help="Use the configured databases instead of a throwaway copy.",
+        )
+
+    def handle(self, *args: object, **options: object) -> None:  # noqa: ARG002
+        """Run each mode and write the JSON report."""
+        with ExitStack() as stack:
+            stack.enter_context(in_process_environment(use_test_db=not options["no_test_db"]))
+            base_id = time.time_ns() // 1000
+            results = {}
+            for offset, mode in enumerate(options["modes"]):
+                payloads = [_payload(base_id + offset * options["registrations"] + i) for i in range(options["registrations"])]
+                results[mode] = asyncio.run(self.run_mode(mode, payloads, options))
+
+        report = {
+            "registrations": options["registrations"],
+            "batch_size": options["batch_size"],
+            "http_target": options["url"] or "in-process ASGI",
+            "modes": results,
+        }
+        if set(MODES) <= set(results):
+            report["speedup"] = round(results["inprocess"]["per_second"] / results["http"]["per_second"], 2)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    async def run_mode(self, mode: str, payloads: list[dict], options: dict) -> dict:
+        """Submit every payload, wait for the last flush and return the timing."""
+        limits = {"max_batch_size": options["batch_size"], "max_latency": 0.05, "max_pending": len(payloads)}
+        client = None
+        if mode == "http":
+            transport = None if options["url"] else httpx.ASGITransport(app=get_asgi_application())
+            client = httpx.AsyncClient(transport=transport, base_url=options["url"] or "http://testserver", timeout=60)
+            batcher = RegistrationBatcher(client, reverse("telegram-register-bulk"), **limits)
+        else:
+            batcher = InProcessRegistrationBatcher(**limits)
+
+        started = time.perf_counter()
+        batcher.start()
+        for payload in payloads:
+            batcher.submit(payload)
+        await batcher.stop()
+        elapsed = time.perf_counter() - started
+        if client is not None:
+            await client.aclose()
+        return {"seconds": round(elapsed, 3), "per_second": round(len(payloads) / elapsed, 1)}
@@ -0,0 +1,115 @@
+"""Benchmark password hashing on this host and recommend cost parameters."""
+
+import importlib.util
+import os
+import statistics
+import time
+
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BasePasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+from django.core.management.base import BaseCommand, CommandParser
+
+CALIBRATION_PASSWORD = "calibration-password-123"  # noqa: S105
+
+# Argon2 is only offered when argon2-cffi is installed
+ALGORITHMS = ["pbkdf2", "scrypt", *(["argon2"] if importlib.util.find_spec("argon2") else [])]
+
+# Largest scrypt memory use (128 * block_size * work_factor bytes) the search will try
+SCRYPT_MAX_MEMORY = 256 * 1024 * 1024
+
+
+def time_hash(hasher: BasePasswordHasher, rounds: int) -> float:
+    """Return the median seconds ``hasher`` takes to hash one password."""
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        hasher.encode(CALIBRATION_PASSWORD, hasher.salt())
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    """Recommend hasher parameters for a target per-hash latency."""
+
+    help = (
+        "Measure the configured password hasher family on this host and recommend the "
+        "cost parameters that hash one password in about --target-ms milliseconds."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command line arguments."""
+        parser.add_argument("--algorithm", choices=ALGORITHMS, default="pbkdf2")
+        parser.add_argument("--target-ms", type=float, default=250.0, help="Target time to hash one password.")
+        parser.add_argument("--rounds", type=int, default=3, help="Timed hashes per measurement.")
+
+    def handle(self, *args: object, **options: object) -> None:  # noqa: ARG002
+        """Run the calibration and print the recommendation."""
+        target = options["target_ms"] / 1000
+        rounds = options["rounds"]
+        calibrate = getattr(self, f"calibrate_{options['algorithm']}")
+        params, seconds = calibrate(target, rounds)
+
+        cores = os.cpu_count() or 1
+        self.stdout.write(f"Algorithm: {options['algorithm']} (target {options['target_ms']:.0f} ms)")
+        self.stdout.write(f"Measured: {seconds * 1000:.1f} ms per hash")
+        self.stdout.write(
+            f"Capacity: ~{1 / seconds:.1f} logins/s per core, ~{cores / seconds:.1f} logins/s across {cores} CPU(s)",
+        )
+        self.stdout.write("Recommended environment:")
+        self.stdout.write(f"DJANGO_PASSWORD_HASHER={options['algorithm']}")
+        for name, value in params.items():
+            self.stdout.write(f"{name}={value}")
+
+    def calibrate_pbkdf2(self, target: float, rounds: int) -> tuple[dict, float]:
+        """Scale the iteration count linearly from a probe measurement."""
+        hasher = PBKDF2PasswordHasher()
+        hasher.iterations = 100_000
+        probe = time_hash(hasher, rounds)
+        hasher.iterations = max(10_000, int(round(hasher.iterations * target / probe, -4)))
+        return {"PBKDF2_ITERATIONS": hasher.iterations}, time_hash(hasher, rounds)
+
+    def calibrate_scrypt(self, target: float, rounds: int) -> tuple[dict, float]:
+        """Pick the largest power-of-two work factor within the target and ``SCRYPT_MAX_MEMORY``."""
+        hasher = ScryptPasswordHasher()
+        best = None
+        for exponent in range(12, 23):
+            work_factor = 2**exponent
+            if 128 * hasher.block_size * work_factor > SCRYPT_MAX_MEMORY:
+                self.stdout.write(
+                    f"Work factor capped at {best[0]} to keep scrypt within "
+                    f"{SCRYPT_MAX_MEMORY // 2**20} MiB; the target was not reached.",
+                )
+                break
+            hasher.work_factor = work_factor
+            hasher.maxmem = 2 * 128 * hasher.work_factor * hasher.block_size * hasher.parallelism
+            seconds = time_hash(hasher, rounds)
+            if best is not None and seconds > target:
+                break
+            best = (hasher.work_factor, seconds)
+        params = {
+            "SCRYPT_WORK_FACTOR": best[0],
+            "SCRYPT_BLOCK_SIZE": hasher.block_size,
+            "SCRYPT_PARALLELISM": hasher.parallelism,
+        }
+        return params, best[1]
+
+    def calibrate_argon2(self, target: float, rounds: int) -> tuple[dict, float]:
+        """Raise the time cost at the default memory cost until the target is reached."""
+        hasher = Argon2PasswordHasher()
+        best = None
+        for time_cost in range(1, 33):
+            hasher.time_cost = time_cost
+            seconds = time_hash(hasher, rounds)
+            if best is not None and seconds > target:
+                break
+            best = (time_cost, seconds)
+        params = {
+            "ARGON2_TIME_COST": best[0],
+            "ARGON2_MEMORY_COST": hasher.memory_cost,
+            "ARGON2_PARALLELISM": hasher.parallelism,
+        }
+        return params, best[1]
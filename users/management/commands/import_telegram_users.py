@@ -0,0 +1,128 @@
+"""Bulk import Telegram users from a JSONL or CSV file."""
+
+import csv
+import json
+import time
+from collections import Counter
+from collections.abc import Iterator
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from users.models import TelegramUser
+from users.serializers import TelegramUserSerializer
+
+
+class Command(BaseCommand):
+    """Stream a file of Telegram users into the database in chunked upserts."""
+
+    help = (
+        "Import Telegram users from a JSONL or CSV file shaped like TelegramUserSerializer input. "
+        "Rows are validated and upserted in batches, one transaction per batch (per shard of a batch "
+        "when sharded), and progress is checkpointed so an interrupted import resumes where it stopped."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command line arguments."""
+        parser.add_argument("path", type=Path, help="JSONL or CSV file to import.")
+        parser.add_argument("--format", choices=["jsonl", "csv"], help="File format (default: from the extension).")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction.")
+        parser.add_argument("--checkpoint", type=Path, help="Checkpoint file (default: PATH.checkpoint).")
+        parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over.")
+
+    def handle(self, *args: object, **options: object) -> None:  # noqa: ARG002
+        """Run the import."""
+        path = options["path"]
+        if not path.is_file():
+            msg = f"{path} does not exist."
+            raise CommandError(msg)
+        file_format = options["format"] or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+        checkpoint = options["checkpoint"] or path.with_name(path.name + ".checkpoint")
+        batch_size = options["batch_size"]
+
+        start = 0 if options["restart"] else self.read_checkpoint(checkpoint, path)
+        if start:
+            self.stdout.write(f"Resuming after {start} rows from {checkpoint}")
+
+        totals = Counter()
+        position = start
+        started = time.perf_counter()
+        batch = []
+        for number, record in self.iter_records(path, file_format, skip=start):
+            batch.append((number, record))
+            if len(batch) >= batch_size:
+                position = self.import_batch(batch, totals)
+                self.write_checkpoint(checkpoint, path, position)
+                self.report_progress(position - start, started)
+                batch = []
+        if batch:
+            position = self.import_batch(batch, totals)
+            self.write_checkpoint(checkpoint, path, position)
+
+        elapsed = time.perf_counter() - started
+        checkpoint.unlink(missing_ok=True)
+        processed = position - start
+        rate = processed / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {processed} rows in {elapsed:.2f}s ({rate:.0f} rows/s): "
+            f"{totals['created']} created, {totals['updated']} updated, "
+            f"{totals['unchanged']} unchanged, {totals['invalid']} invalid.",
+        ))
+
+    def iter_records(self, path: Path, file_format: str, skip: int) -> Iterator[tuple[int, object]]:
+        """Yield ``(row number, record)`` pairs after the first ``skip`` rows, streaming the file."""
+        with path.open(newline="", encoding="utf-8") as stream:
+            rows = csv.DictReader(stream) if file_format == "csv" else stream
+            for number, row in enumerate(rows, start=1):
+                if number <= skip:
+                    continue
+                if file_format == "csv":
+                    yield number, row
+                    continue
+                try:
+                    yield number, json.loads(row) if row.strip() else None
+                except ValueError:
+                    yield number, "malformed JSON"
+
+    def import_batch(self, batch: list[tuple[int, object]], totals: Counter) -> int:
+        """Validate and upsert one batch; return the last row number.
+
+        The batch is one transaction, or one per shard when sharded, so a
+        crash can leave some shards of the batch written. The checkpoint only
+        moves past the batch once all of them committed, and upserts are
+        idempotent, so the resumed import simply writes those rows again.
+        """
+        records = [(number, record) for number, record in batch if record is not None]
+        results = TelegramUserSerializer.validate_many(record for _, record in records)
+        rows = {}
+        for (number, _), (validated_data, errors) in zip(records, results, strict=True):
+            if errors is None:
+                rows[validated_data["telegram_id"]] = dict(validated_data)
+            else:
+                totals["invalid"] += 1
+                self.stderr.write(f"Row {number}: {errors}")
+
+        statuses = TelegramUser.objects.bulk_upsert(list(rows.values()), batch_size=len(rows) or 1)
+        totals.update(statuses.values())
+        return batch[-1][0]
+
+    def read_checkpoint(self, checkpoint: Path, path: Path) -> int:
+        """Return the number of rows already imported from ``path``."""
+        if not checkpoint.exists():
+            return 0
+        state = json.loads(checkpoint.read_text())
+        if state.get("source") != str(path.resolve()):
+            msg = f"{checkpoint} belongs to another file; pass --restart to ignore it."
+            raise CommandError(msg)
+        return state["rows"]
+
+    def write_checkpoint(self, checkpoint: Path, path: Path, rows: int) -> None:
+        """Atomically record that the first ``rows`` rows are committed."""
+        tmp = checkpoint.with_name(checkpoint.name + ".tmp")
+        tmp.write_text(json.dumps({"source": str(path.resolve()), "rows": rows}))
+        tmp.replace(checkpoint)
+
+    def report_progress(self, processed: int, started: float) -> None:
+        """Write the running row count and rate."""
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{processed} rows, {processed / elapsed if elapsed else 0.0:.0f} rows/s")
@@ -0,0 +1,79 @@
+"""Compare JSON rendering and parsing cost for the users API payloads."""
+
+import io
+import json
+import time
+from collections.abc import Callable
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandParser
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from users.models import TelegramUser
+from users.parsers import FastJSONParser
+from users.renderers import FastJSONRenderer, orjson
+from users.serializers import TelegramUserSerializer, UserSerializer
+
+
+def best_ms(func: Callable[[], object], rounds: int) -> float:
+    """Return the fastest of ``rounds`` calls in milliseconds."""
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) * 1000, 3)
+
+
+class Command(BaseCommand):
+    """Time the stdlib and orjson-backed renderer and parser on serializer output."""
+
+    help = (
+        "Render and parse UserSerializer and TelegramUserSerializer payloads with DRF's "
+        "JSONRenderer/JSONParser and with FastJSONRenderer/FastJSONParser, and report the "
+        "best time of each as JSON. No database access is needed."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command line arguments."""
+        parser.add_argument("--items", type=int, default=1000, help="Objects per payload.")
+        parser.add_argument("--rounds", type=int, default=20, help="Timed repetitions; the best one is reported.")
+
+    def handle(self, *args: object, **options: object) -> None:  # noqa: ARG002
+        """Run the benchmark."""
+        items, rounds = options["items"], options["rounds"]
+        users = [
+            User(id=i, username=f"user{i}", email=f"user{i}@example.com", first_name="Zoë", last_name="Łukasz")
+            for i in range(items)
+        ]
+        telegram_users = [
+            TelegramUser(telegram_id=10**9 + i, username=f"tg_user{i}", first_name="Алексей", language_code="ru")
+            for i in range(items)
+        ]
+        payloads = {
+            "UserSerializer": lambda: UserSerializer(users, many=True).data,
+            "TelegramUserSerializer": lambda: TelegramUserSerializer(telegram_users, many=True).data,
+        }
+
+        report = {"items": items, "rounds": rounds, "orjson": orjson.__version__ if orjson else None, "payloads": {}}
+        for name, serialize in payloads.items():
+            data = serialize()
+            body = JSONRenderer().render(data)
+            result = {
+                "bytes": len(body),
+                "serialize_ms": best_ms(serialize, rounds),
+                "render_ms": {
+                    "stdlib": best_ms(lambda data=data: JSONRenderer().render(data), rounds),
+                    "fast": best_ms(lambda data=data: FastJSONRenderer().render(data), rounds),
+                },
+                "parse_ms": {
+                    "stdlib": best_ms(lambda body=body: JSONParser().parse(io.BytesIO(body)), rounds),
+                    "fast": best_ms(lambda body=body: FastJSONParser().parse(io.BytesIO(body)), rounds),
+                },
+            }
+            for step in ("render_ms", "parse_ms"):
+                timings = result[step]
+                timings["speedup"] = round(timings["stdlib"] / timings["fast"], 2) if timings["fast"] else None
+            report["payloads"][name] = result
+        self.stdout.write(json.dumps(report, indent=2))
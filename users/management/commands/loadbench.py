@@ -0,0 +1,227 @@
+"""Drive the users API routes under load and report latency statistics."""
+
+import copy
+import json
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
+
+import httpx
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from django.urls import reverse
+
+BENCH_PASSWORD = "loadbench-pass-123"  # noqa: S105
+
+
+def in_process_environment(*, use_test_db: bool) -> ExitStack:
+    """Return a context that isolates in-process benchmark runs from real side effects."""
+    stack = ExitStack()
+    stack.enter_context(override_settings(
+        ALLOWED_HOSTS=["testserver"],
+        EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    ))
+    if use_test_db:
+        # File-backed throwaway databases in WAL mode with BEGIN IMMEDIATE, so
+        # concurrent writers queue on SQLite's busy timeout instead of failing
+        # with "database is locked" on shared-cache locks or lock upgrades.
+        tmpdir = stack.enter_context(tempfile.TemporaryDirectory())
+        for alias in connections:
+            conn = connections[alias]
+            if conn.vendor == "sqlite":
+                stack.callback(_restore_settings, conn.settings_dict, copy.deepcopy(conn.settings_dict))
+                conn.settings_dict["TEST"]["NAME"] = f"{tmpdir}/{alias}.sqlite3"
+                conn.settings_dict["OPTIONS"] = {**conn.settings_dict["OPTIONS"], "timeout": 30, "transaction_mode": "IMMEDIATE"}
+                conn.settings_dict["PRAGMAS"] = {**conn.settings_dict.get("PRAGMAS", {}), "journal_mode": "wal"}
+        old_config = setup_databases(verbosity=0, interactive=False)
+        stack.callback(teardown_databases, old_config, verbosity=0)
+    return stack
+
+
+def _restore_settings(settings_dict: dict, saved: dict) -> None:
+    """Put a connection's settings back as they were before the benchmark."""
+    settings_dict.clear()
+    settings_dict.update(saved)
+
+
+class InProcessSession:
+    """Issue requests through Django's test client, counting DB queries."""
+
+    counts_queries = True
+
+    def __init__(self) -> None:
+        """Create a client that reports server errors as responses."""
+        self.client = Client(raise_request_exception=False)
+
+    def request(self, method: str, path: str, data: object = None, token: str | None = None) -> tuple[int, dict | None, int]:
+        """Send one request; return status, decoded JSON body and query count."""
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            if method == "GET":
+                response = self.client.get(path, headers=headers)
+            else:
+                response = self.client.post(path, json.dumps(data), content_type="application/json", headers=headers)
+        body = response.json() if response.get("Content-Type") == "application/json" else None
+        return response.status_code, body, len(queries)
+
+
+class HTTPSession:
+    """Issue requests to a running server over a pooled HTTP client."""
+
+    counts_queries = False
+
+    def __init__(self, client: httpx.Client) -> None:
+        """Wrap a shared HTTP client."""
+        self.client = client
+
+    def request(self, method: str, path: str, data: object = None, token: str | None = None) -> tuple[int, dict | None, int]:
+        """Send one request; return status, decoded JSON body and a zero query count."""
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = self.client.request(method, path, json=data, headers=headers)
+        body = response.json() if response.headers.get("Content-Type") == "application/json" else None
+        return response.status_code, body, 0
+
+
+def _telegram_payload(telegram_id: int) -> dict:
+    """Return a registration payload shaped like TelegramUserSerializer input."""
+    return {"telegram_id": telegram_id, "username": f"tg{telegram_id}", "first_name": "Load", "language_code": "en"}
+
+
+class Command(BaseCommand):
+    """Benchmark the users API routes and print the results as JSON."""
+
+    help = "Benchmark the users API routes and print throughput, latency percentiles and queries per request as JSON."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command line arguments."""
+        parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads.")
+        parser.add_argument("--scenarios", nargs="+", choices=self.scenarios(), default=list(self.scenarios()))
+        parser.add_argument("--bulk-size", type=int, default=100, help="Payloads per bulk registration request.")
+        parser.add_argument("--url", help="Base URL of a running server. Defaults to an in-process client.")
+        parser.add_argument(
+            "--no-test-db",
+            action="store_true",
+            help="In-process mode: use the configured databases instead of a throwaway copy.",
+        )
+
+    @staticmethod
+    def scenarios() -> dict[str, Callable]:
+        """Return the benchmark scenarios, each issuing the i-th request of its route."""
+        return {
+            "register": lambda session, ctx, i: session.request(
+                "POST", reverse("register"),
+                {"username": f"bench-{ctx['run_id']}-{i}", "email": f"bench{i}@example.com", "password": BENCH_PASSWORD},
+            ),
+            "token_obtain": lambda session, ctx, _: session.request(
+                "POST", reverse("token_obtain_pair"), {"username": ctx["username"], "password": BENCH_PASSWORD},
+            ),
+            "token_refresh": lambda session, ctx, _: session.request(
+                "POST", reverse("token_refresh"), {"refresh": ctx["refresh"]},
+            ),
+            "profile": lambda session, ctx, _: session.request("GET", reverse("profile"), token=ctx["access"]),
+            "telegram_register": lambda session, ctx, i: session.request(
+                "POST", reverse("telegram-register"), _telegram_payload(ctx["telegram_base"] + i),
+            ),
+            "telegram_register_bulk": lambda session, ctx, i: session.request(
+                "POST", reverse("telegram-register-bulk"),
+                [_telegram_payload(ctx["telegram_base"] + 10_000_000 + i * ctx["bulk_size"] + j) for j in range(ctx["bulk_size"])],
+            ),
+        }
+
+    def handle(self, *args: object, **options: object) -> None:  # noqa: ARG002
+        """Run the selected scenarios and write the JSON report."""
+        with ExitStack() as stack:
+            if options["url"]:
+                client = stack.enter_context(httpx.Client(base_url=options["url"], timeout=30))
+                make_session = lambda: HTTPSession(client)  # noqa: E731
+            else:
+                stack.enter_context(in_process_environment(use_test_db=not options["no_test_db"]))
+                make_session = InProcessSession
+
+            ctx = self.prepare(make_session(), options)
+            report = {
+                "target": options["url"] or "in-process",
+                "concurrency": options["concurrency"],
+                "requests": options["requests"],
+                "scenarios": {
+                    name: self.run_scenario(name, make_session, ctx, options)
+                    for name in options["scenarios"]
+                },
+            }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def prepare(self, session: InProcessSession | HTTPSession, options: dict) -> dict:
+        """Create the benchmark account and tokens shared by the scenarios."""
+        run_id = uuid.uuid4().hex[:8]
+        username = f"loadbench-{run_id}"
+        if isinstance(session, InProcessSession):
+            User.objects.create_user(username, f"{username}@example.com", BENCH_PASSWORD)
+        else:
+            session.request("POST", reverse("register"), {"username": username, "email": f"{username}@example.com", "password": BENCH_PASSWORD})
+        _, tokens, _ = session.request("POST", reverse("token_obtain_pair"), {"username": username, "password": BENCH_PASSWORD})
+        return {
+            "run_id": run_id,
+            "username": username,
+            "access": tokens["access"],
+            "refresh": tokens["refresh"],
+            "telegram_base": int(time.time()) * 1000,
+            "bulk_size": options["bulk_size"],
+        }
+
+    def run_scenario(self, name: str, make_session: Callable, ctx: dict, options: dict) -> dict:
+        """Issue the scenario's requests concurrently and summarize them."""
+        scenario = self.scenarios()[name]
+        local = threading.local()
+        lock = threading.Lock()
+        latencies, query_counts, errors = [], [], 0
+
+        def call(i: int) -> None:
+            nonlocal errors
+            if not hasattr(local, "session"):
+                local.session = make_session()
+            started = time.perf_counter()
+            status_code, _, queries = scenario(local.session, ctx, i)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                query_counts.append(queries)
+                errors += status_code >= 400  # noqa: PLR2004
+
+        concurrency = options["concurrency"]
+        started = time.perf_counter()
+        # A single client runs inline, which keeps it on this thread's DB connection
+        with ThreadPoolExecutor(concurrency) if concurrency > 1 else nullcontext() as pool:
+            list((pool.map if pool else map)(call, range(options["requests"])))
+        wall = time.perf_counter() - started
+
+        summary = {
+            "requests": len(latencies),
+            "errors": errors,
+            "seconds": round(wall, 3),
+            "throughput_rps": round(len(latencies) / wall, 1) if wall else None,
+            **_percentiles_ms(latencies),
+            "queries_per_request": round(statistics.mean(query_counts), 2) if make_session is InProcessSession else None,
+        }
+        if name == "telegram_register_bulk":
+            summary["rows_per_second"] = round(len(latencies) * ctx["bulk_size"] / wall, 1) if wall else None
+        return summary
+
+
+def _percentiles_ms(latencies: list[float]) -> dict:
+    """Return the p50/p95/p99 of ``latencies`` in milliseconds."""
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    if len(latencies) == 1:
+        cuts = [latencies[0]] * 99
+    else:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {f"p{p}_ms": round(cuts[p - 1] * 1000, 2) for p in (50, 95, 99)}
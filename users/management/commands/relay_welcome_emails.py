@@ -0,0 +1,28 @@
+"""Relay pending welcome emails from the outbox to the task queue."""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from users.tasks import relay_welcome_emails
+
+
+class Command(BaseCommand):
+    """Drain the welcome-email outbox, once or continuously."""
+
+    help = "Relay pending welcome emails to Celery in batches (alternative to the beat schedule)."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command line arguments."""
+        parser.add_argument("--loop", action="store_true", help="Keep relaying until interrupted.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between runs with --loop.")
+
+    def handle(self, *args: object, **options: object) -> None:  # noqa: ARG002
+        """Relay the outbox."""
+        while True:
+            relayed = relay_welcome_emails()
+            if relayed:
+                self.stdout.write(f"Relayed {relayed} welcome emails")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
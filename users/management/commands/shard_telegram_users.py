@@ -0,0 +1,68 @@
+"""Move Telegram users onto the shards that own them."""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from users.models import TelegramUser
+from users.routers import shard_for
+
+
+class Command(BaseCommand):
+    """Copy misplaced TelegramUser rows to their shard, then delete them where they were."""
+
+    help = (
+        "Move Telegram users from the default database (rows written before sharding was enabled) and "
+        "from shards that no longer own them (after TELEGRAM_USER_SHARD_COUNT changed) onto their shard. "
+        "Each batch is copied and then deleted, so an interrupted run can simply be repeated. A row "
+        "already on the owning shard is newer and is kept; the misplaced copy is dropped."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command line arguments."""
+        parser.add_argument(
+            "--from", dest="sources", nargs="+", metavar="ALIAS",
+            help="Databases to move rows out of (default: default and every shard).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows read per batch.")
+
+    def handle(self, *args: object, **options: object) -> None:  # noqa: ARG002
+        """Move every misplaced row."""
+        if not settings.TELEGRAM_USER_SHARDS:
+            msg = "Telegram users are not sharded; set TELEGRAM_USER_SHARD_COUNT."
+            raise CommandError(msg)
+        table = TelegramUser._meta.db_table  # noqa: SLF001
+        for source in options["sources"] or [DEFAULT_DB_ALIAS, *settings.TELEGRAM_USER_SHARDS]:
+            if table not in connections[source].introspection.table_names():
+                continue
+            moved = self.move_from(source, options["batch_size"])
+            self.stdout.write(f"Moved {moved} Telegram users from {source}")
+        self.stdout.write(self.style.SUCCESS("Telegram users are on their shards."))
+
+    def move_from(self, source: str, batch_size: int) -> int:
+        """Move the rows of ``source`` that belong to another shard; return how many."""
+        fields = [field.attname for field in TelegramUser._meta.concrete_fields if not field.primary_key]  # noqa: SLF001
+        moved = last_id = 0
+        while True:
+            rows = list(
+                TelegramUser.objects.using(source).filter(id__gt=last_id).order_by("id").values("id", *fields)[:batch_size],
+            )
+            if not rows:
+                return moved
+            last_id = rows[-1]["id"]
+            by_shard = defaultdict(list)
+            for row in rows:
+                shard = shard_for(row["telegram_id"])
+                if shard != source:
+                    by_shard[shard].append(row)
+            for shard, shard_rows in by_shard.items():
+                TelegramUser.objects.using(shard).bulk_create(
+                    [TelegramUser(**{field: row[field] for field in fields}) for row in shard_rows],
+                    ignore_conflicts=True,
+                )
+            misplaced = [row["id"] for shard_rows in by_shard.values() for row in shard_rows]
+            with transaction.atomic(using=source):
+                TelegramUser.objects.using(source).filter(id__in=misplaced).delete()
+            moved += len(misplaced)
@@ -0,0 +1,97 @@
+"""Measure cold-start time of the worker and bot processes."""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+# Each snippet runs in a fresh interpreter and prints its time-to-ready in milliseconds
+BOOT_SNIPPETS = {
+    # What `celery worker` does before consuming: load the app, set up Django,
+    # run the system checks and import every task module
+    "worker": (
+        "import time; started = time.perf_counter()\n"
+        "from klb_assignment.celery import app\n"
+        "app.loader.import_default_modules(); app.finalize()\n"
+        "print((time.perf_counter() - started) * 1000)\n"
+    ),
+    "bot": (
+        "import time; started = time.perf_counter()\n"
+        "import telegram_bot.app\n"
+        "print((time.perf_counter() - started) * 1000)\n"
+    ),
+}
+
+
+class Command(BaseCommand):
+    """Boot worker and bot processes repeatedly and report startup and import times."""
+
+    help = (
+        "Start the Celery worker app and the Telegram bot in fresh interpreters under each "
+        "settings module and report median time-to-ready plus the packages whose imports "
+        "cost the most (from `python -X importtime`), as JSON."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command line arguments."""
+        parser.add_argument(
+            "--settings-modules", nargs="+", default=["klb_assignment.settings", "klb_assignment.settings_worker"],
+            help="DJANGO_SETTINGS_MODULE values to compare.",
+        )
+        parser.add_argument("--targets", nargs="+", choices=sorted(BOOT_SNIPPETS), default=sorted(BOOT_SNIPPETS))
+        parser.add_argument("--repeat", type=int, default=5, help="Cold starts per target; the median is reported.")
+        parser.add_argument("--top", type=int, default=10, help="Packages listed in the import breakdown.")
+
+    def handle(self, *args: object, **options: object) -> None:  # noqa: ARG002
+        """Run the report."""
+        report = {"repeat": options["repeat"], "results": []}
+        for target in options["targets"]:
+            # The bot does not load Django, so one settings module is enough
+            modules = options["settings_modules"] if target == "worker" else options["settings_modules"][:1]
+            for module in modules:
+                ready, process = [], []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    ready.append(float(self.boot(target, module).stdout.strip().splitlines()[-1]))
+                    process.append((time.perf_counter() - started) * 1000)
+                imports = self.import_breakdown(self.boot(target, module, importtime=True).stderr)
+                report["results"].append({
+                    "target": target,
+                    "settings": module,
+                    "ready_ms": round(statistics.median(ready), 1),
+                    "process_ms": round(statistics.median(process), 1),
+                    "modules_imported": imports["count"],
+                    "import_self_ms_by_package": dict(imports["by_package"].most_common(options["top"])),
+                })
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def boot(self, target: str, module: str, *, importtime: bool = False) -> subprocess.CompletedProcess:
+        """Run one cold start of ``target`` with ``module`` as the settings."""
+        flags = ["-X", "importtime"] if importtime else []
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": module}
+        result = subprocess.run(  # noqa: S603 - runs this interpreter on a fixed snippet
+            [sys.executable, *flags, "-c", BOOT_SNIPPETS[target]],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR, check=False,
+        )
+        if result.returncode:
+            msg = f"{target} failed to start with {module}:\n{result.stderr[-2000:]}"
+            raise CommandError(msg)
+        return result
+
+    def import_breakdown(self, stderr: str) -> dict:
+        """Sum ``-X importtime`` self times (ms) per top-level package."""
+        by_package = Counter()
+        count = 0
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            self_us, _, name = (part.strip() for part in line.removeprefix("import time:").split("|"))
+            by_package[name.split(".")[0]] += int(self_us) / 1000
+            count += 1
+        return {"count": count, "by_package": Counter({name: round(ms, 1) for name, ms in by_package.items()})}
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="telegramuser",
+            name="fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_telegramuser_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="telegramuser",
+            index=models.Index(fields=["language_code", "id"], name="tguser_language_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="telegramuser",
+            index=models.Index(fields=["username", "id"], name="tguser_username_id_idx"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_welcomeemailoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="telegramuser",
+            name="interaction_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="telegramuser",
+            name="last_seen_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,5 +1,151 @@
 """models for users app."""
-from django.db import models
+import hashlib
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from datetime import datetime
+from typing import ClassVar
+
+from django.conf import settings
+from django.db import connections, models, transaction
+
+from .routers import shard_for
+
+# Profile fields rewritten when an incoming payload upserts an existing row.
+TELEGRAM_UPSERT_FIELDS = ["username", "first_name", "last_name", "language_code"]
+
+
+def telegram_fingerprint(values: dict) -> str:
+    """Return a digest of the profile fields, used to skip no-op writes."""
+    content = "\x1f".join(str(values.get(field) or "") for field in TELEGRAM_UPSERT_FIELDS)
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+class TelegramUserQuerySet(models.QuerySet):
+    """QuerySet with batched write helpers for TelegramUser."""
+
+    def username_prefix(self, prefix: str) -> "TelegramUserQuerySet":
+        """Filter usernames starting with ``prefix``.
+
+        Written as a range rather than ``startswith`` (which becomes ``LIKE``
+        and skips the index on SQLite). The range only equals a prefix match
+        under a binary collation, as SQLite's default and PostgreSQL's "C";
+        other collations order strings differently and need ``startswith``
+        with a pattern-ops index instead.
+        """
+        return self.filter(username__gte=prefix, username__lt=prefix + "\U0010ffff")
+
+    def for_telegram_id(self, telegram_id: int) -> "TelegramUserQuerySet":
+        """Return this queryset on the shard holding ``telegram_id``.
+
+        Unchanged when sharding is off or a database was chosen with ``using()``.
+        """
+        if self._db is not None or not settings.TELEGRAM_USER_SHARDS:
+            return self
+        return self.using(shard_for(telegram_id))
+
+    def _split_by_shard(self, items: Iterable, telegram_id: Callable) -> list[tuple["TelegramUserQuerySet", list]]:
+        """Group ``items`` by shard, each group paired with a queryset on that shard."""
+        if self._db is not None or not settings.TELEGRAM_USER_SHARDS:
+            return [(self, list(items))]
+        groups = defaultdict(list)
+        for item in items:
+            groups[shard_for(telegram_id(item))].append(item)
+        return [(self.using(alias), group) for alias, group in groups.items()]
+
+    def upsert(self, data: dict) -> tuple["TelegramUser", bool]:
+        """Insert or update one row keyed by ``telegram_id`` in a single statement.
+
+        Fields missing from ``data`` keep their stored values. The statement is
+        ``INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... WHERE`` some given
+        field differs, so an unchanged row is not rewritten. Returns an
+        instance holding the payload (without the stored fields or primary
+        key) and whether a row was written.
+        """
+        instance = self.model(**data)
+        partial = not set(TELEGRAM_UPSERT_FIELDS) <= data.keys()
+        # The digest of a partial payload depends on stored fields, so it is
+        # only kept for inserts; a blank one never matches, as for old rows
+        instance.fingerprint = telegram_fingerprint(vars(instance))
+        connection = connections[self.for_telegram_id(data["telegram_id"]).db]
+        quote = connection.ops.quote_name
+        opts = self.model._meta  # noqa: SLF001
+        table = quote(opts.db_table)
+        fields = [field for field in opts.concrete_fields if not field.primary_key]
+        updated = [field for field in TELEGRAM_UPSERT_FIELDS if field in data]
+        assignments = [f"{quote(field)} = excluded.{quote(field)}" for field in updated]
+        assignments.append(f"{quote('fingerprint')} = " + ("''" if partial else f"excluded.{quote('fingerprint')}"))
+        changed = [f"{table}.{quote(field)} <> excluded.{quote(field)}" for field in updated]
+        if not partial:
+            changed.append(f"{table}.{quote('fingerprint')} <> excluded.{quote('fingerprint')}")
+        # Only quoted column names are interpolated; values are parameters
+        sql = (
+            f"INSERT INTO {table} ({', '.join(quote(field.column) for field in fields)}) "  # noqa: S608
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            f"ON CONFLICT ({quote('telegram_id')}) DO UPDATE SET {', '.join(assignments)} "
+            f"WHERE {' OR '.join(changed) or '1 = 0'}"
+        )
+        params = [field.get_db_prep_save(getattr(instance, field.attname), connection) for field in fields]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return instance, cursor.rowcount > 0
+
+    def bulk_upsert(self, rows: list[dict], batch_size: int = 500) -> dict[int, str]:
+        """Insert or update rows keyed by ``telegram_id``, one statement per chunk.
+
+        Rows replace the stored profile fields (missing fields become blank)
+        and rows identical to the stored ones are skipped. Returns a mapping
+        of ``telegram_id`` to ``"created"``, ``"updated"`` or ``"unchanged"``.
+        When sharded, each shard's chunks commit in their own transactions.
+        """
+        statuses = {}
+        for queryset, shard_rows in self._split_by_shard(rows, lambda row: row["telegram_id"]):
+            for start in range(0, len(shard_rows), batch_size):
+                chunk = shard_rows[start:start + batch_size]
+                with transaction.atomic(using=queryset.db, savepoint=False):
+                    stored = dict(
+                        queryset.filter(telegram_id__in=[row["telegram_id"] for row in chunk])
+                        .values_list("telegram_id", "fingerprint"),
+                    )
+                    objs = []
+                    for row in chunk:
+                        telegram_id = row["telegram_id"]
+                        fingerprint = telegram_fingerprint(row)
+                        if stored.get(telegram_id) == fingerprint:
+                            statuses[telegram_id] = "unchanged"
+                            continue
+                        statuses[telegram_id] = "updated" if telegram_id in stored else "created"
+                        objs.append(self.model(**row, fingerprint=fingerprint))
+                    if objs:
+                        queryset.bulk_create(
+                            objs,
+                            update_conflicts=True,
+                            unique_fields=["telegram_id"],
+                            update_fields=[*TELEGRAM_UPSERT_FIELDS, "fingerprint"],
+                        )
+        return statuses
+
+    def add_activity(self, touches: dict[int, tuple[int, datetime]], batch_size: int = 500) -> int:
+        """Record buffered interactions, one UPDATE statement per chunk.
+
+        ``touches`` maps ``telegram_id`` to ``(interactions, last seen)``; each
+        row's counter is incremented in SQL and ``last_seen_at`` overwritten.
+        Unknown ids are ignored. Returns the number of rows updated.
+        """
+        updated = 0
+        for queryset, items in self._split_by_shard(touches.items(), lambda item: item[0]):
+            for start in range(0, len(items), batch_size):
+                chunk = items[start:start + batch_size]
+                updated += queryset.filter(telegram_id__in=[telegram_id for telegram_id, _ in chunk]).update(
+                    interaction_count=models.F("interaction_count") + models.Case(
+                        *(models.When(telegram_id=telegram_id, then=models.Value(count)) for telegram_id, (count, _) in chunk),
+                        output_field=models.PositiveIntegerField(),
+                    ),
+                    last_seen_at=models.Case(
+                        *(models.When(telegram_id=telegram_id, then=models.Value(seen)) for telegram_id, (_, seen) in chunk),
+                        output_field=models.DateTimeField(),
+                    ),
+                )
+        return updated
 
 
 class TelegramUser(models.Model):
@@ -10,7 +156,38 @@ class TelegramUser(models.Model):
     first_name = models.CharField(max_length=255, blank=True)
     last_name = models.CharField(max_length=255, blank=True)
     language_code = models.CharField(max_length=10, blank=True)
+    # Digest of the profile fields; blank for rows not yet written by an upsert.
+    fingerprint = models.CharField(max_length=32, blank=True, editable=False)
+    # Engagement, written in batches from users.activity rather than per request.
+    last_seen_at = models.DateTimeField(null=True, blank=True, editable=False)
+    interaction_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = TelegramUserQuerySet.as_manager()
+
+    class Meta:
+        """Meta class for TelegramUser."""
+
+        indexes: ClassVar = [
+            # Keyset pagination within a language, and username prefix search
+            models.Index(fields=["language_code", "id"], name="tguser_language_id_idx"),
+            models.Index(fields=["username", "id"], name="tguser_username_id_idx"),
+        ]
 
     def __str__(self) -> str:
         """Return a string representation of the TelegramUser instance."""
         return self.username or str(self.telegram_id)
+
+
+class WelcomeEmailOutbox(models.Model):
+    """Welcome email waiting to be relayed to the task queue.
+
+    Rows are written in the same transaction as the user they belong to and
+    deleted only once ``send_welcome_emails`` has been enqueued for them.
+    """
+
+    email = models.EmailField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """Return a string representation of the WelcomeEmailOutbox instance."""
+        return self.email
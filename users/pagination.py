@@ -0,0 +1,47 @@
+"""Pagination classes for the users app."""
+
+from django.core.paginator import Paginator
+from django.db.models import Max, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+
+class TelegramUserCursorPagination(CursorPagination):
+    """Keyset pagination over ``id``: each page is one indexed range query, never an OFFSET scan.
+
+    A view can order by an indexed column matching its filter instead by
+    setting ``cursor_ordering``.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = "id"
+
+    def get_ordering(self, request: Request, queryset: QuerySet, view: APIView) -> tuple[str, ...]:
+        """Return the view's ``cursor_ordering`` if it sets one, else ``ordering``."""
+        return getattr(view, "cursor_ordering", None) or super().get_ordering(request, queryset, view)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never counts a large table row by row.
+
+    An unfiltered queryset is sized from its highest primary key (one index
+    lookup; deleted rows make it an overestimate) and a filtered one with a
+    ``COUNT`` capped at ``count_limit`` rows, so later pages of a broad
+    search are reached by narrowing it.
+    """
+
+    count_limit = 10_000
+
+    @cached_property
+    def count(self) -> int:
+        """Return the estimated number of objects."""
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if not queryset.query.where:
+            return queryset.aggregate(highest=Max("pk"))["highest"] or 0
+        return queryset[:self.count_limit].count()
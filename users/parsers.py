@@ -0,0 +1,31 @@
+"""JSON parser backed by orjson, falling back to DRF's stdlib parser."""
+
+from typing import IO
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """Parse JSON request bodies with orjson when it is installed.
+
+    orjson only accepts UTF-8 and rejects NaN and infinities, matching
+    ``STRICT_JSON``; other charsets go through ``JSONParser``.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream: IO[bytes], media_type: str | None = None, parser_context: dict | None = None) -> object:
+        """Parse the incoming bytestream as JSON and return the resulting data."""
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", "utf-8").lower().replace("_", "-")
+        if orjson is None or encoding not in {"utf-8", "utf8"} or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            msg = f"JSON parse error - {exc}"
+            raise ParseError(msg) from exc
@@ -0,0 +1,76 @@
+"""Bulk account provisioning shared by the admin API and the management command."""
+
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .hashers import hash_passwords
+from .models import WelcomeEmailOutbox
+from .serializers import ProvisionUserSerializer, normalize_user_data
+
+DUPLICATE_USERNAME = "Duplicate username in this batch."
+TAKEN_USERNAME = "A user with that username already exists."
+
+
+def provision_users(items: Iterable) -> list[dict]:
+    """Create accounts for a batch of payloads and return one result per item.
+
+    Payloads are validated individually and usernames checked with a single
+    query; passwords of the valid ones are hashed in a process pool, then the
+    users and their welcome-email outbox rows are inserted in one transaction.
+    If a username is taken between the check and the insert, the batch is
+    retried row by row and the clashing rows are reported as taken.
+    Results are ``{"index", "status": "created", "id", "username"}`` or
+    ``{"index", "status": "invalid", "errors"}``.
+    """
+    results = {}
+    pending = {}
+    for index, (validated_data, errors) in enumerate(ProvisionUserSerializer.validate_many(items)):
+        if errors is not None:
+            results[index] = {"index": index, "status": "invalid", "errors": errors}
+            continue
+        pending[index] = normalize_user_data(validated_data)
+
+    taken = _taken_usernames([data["username"] for data in pending.values()])
+    seen = set()
+    for index, data in list(pending.items()):
+        username = data["username"]
+        if username in taken or username in seen:
+            message = TAKEN_USERNAME if username in taken else DUPLICATE_USERNAME
+            results[index] = {"index": index, "status": "invalid", "errors": {"username": [message]}}
+            del pending[index]
+        seen.add(username)
+
+    passwords = hash_passwords([data.pop("password") for data in pending.values()], settings.PASSWORD_PROVISION_WORKERS)
+    users = {
+        index: User(**data, password=password)
+        for (index, data), password in zip(pending.items(), passwords, strict=True)
+    }
+    try:
+        _insert(list(users.values()))
+    except IntegrityError:
+        for index, user in users.items():
+            user.pk = None  # may have been set by a chunk of the rolled-back bulk insert
+            try:
+                _insert([user])
+            except IntegrityError:
+                results[index] = {"index": index, "status": "invalid", "errors": {"username": [TAKEN_USERNAME]}}
+
+    for index, user in users.items():
+        if index not in results:
+            results[index] = {"index": index, "status": "created", "id": user.pk, "username": user.username}
+    return [results[index] for index in sorted(results)]
+
+
+def _taken_usernames(usernames: list[str]) -> set[str]:
+    """Return which of ``usernames`` already belong to a user."""
+    return set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+
+
+def _insert(users: list[User]) -> None:
+    """Insert ``users`` and their welcome-email outbox rows in one transaction."""
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        WelcomeEmailOutbox.objects.bulk_create(WelcomeEmailOutbox(email=user.email) for user in users)
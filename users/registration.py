@@ -0,0 +1,72 @@
+"""Telegram user registration shared by the sync and async views, the bulk view and the in-process bot."""
+
+from collections.abc import Iterable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import status
+
+from . import idempotency
+from .activity import touch
+from .models import TelegramUser
+from .serializers import TelegramUserSerializer
+
+
+def register_telegram_user(data: dict, idempotency_key: str | None = None) -> idempotency.Outcome:
+    """Validate and upsert one Telegram user payload and return the response to send.
+
+    Fields left out of the payload keep their stored values. Repeats of a
+    registration are answered from the cache (see ``users.idempotency``)
+    but still count as an interaction of the user.
+    """
+    telegram_id = data.get("telegram_id")
+    if not telegram_id:
+        return idempotency.Outcome(status.HTTP_400_BAD_REQUEST, {"error": "telegram_id is required."}, {})
+    outcome = idempotency.deduplicate(telegram_id, data, idempotency_key, lambda: save_telegram_user(data))
+    if idempotency.REPLAYED_HEADER in outcome.headers:
+        # Only successful saves are replayed, so the id passed validation
+        touch([int(telegram_id)])
+    return outcome
+
+
+def save_telegram_user(data: dict) -> tuple[int, dict]:
+    """Validate and upsert ``data``; return the status and body of the response."""
+    serializer = TelegramUserSerializer(data=data)
+    if not serializer.is_valid():
+        return status.HTTP_400_BAD_REQUEST, serializer.errors
+    serializer.save()
+    touch([serializer.validated_data["telegram_id"]])
+    return status.HTTP_201_CREATED, {"message": "Telegram user saved."}
+
+
+def register_telegram_users(items: Iterable) -> dict:
+    """Validate and upsert Telegram user payloads, reporting a status for each item.
+
+    Valid items are upserted in chunks and reported as ``created``,
+    ``updated`` or ``unchanged``, invalid ones as ``invalid`` with their
+    errors. If a ``telegram_id`` repeats, the last item wins. Returns
+    ``{"saved": <valid distinct users>, "results": [...]}``.
+    """
+    results = []
+    rows = {}
+    for index, (validated_data, errors) in enumerate(TelegramUserSerializer.validate_many(items)):
+        if errors is None:
+            telegram_id = validated_data["telegram_id"]
+            rows[telegram_id] = dict(validated_data)
+            results.append({"index": index, "telegram_id": telegram_id})
+        else:
+            results.append({"index": index, "status": "invalid", "errors": errors})
+
+    statuses = TelegramUser.objects.bulk_upsert(list(rows.values()), batch_size=settings.TELEGRAM_BULK_CHUNK_SIZE)
+    for result in results:
+        if "telegram_id" in result:
+            result["status"] = statuses[result["telegram_id"]]
+    touch(result["telegram_id"] for result in results if "telegram_id" in result)
+    idempotency.forget(rows)
+    return {"saved": len(rows), "results": results}
+
+
+# The upserts use raw cursors and transactions, which the async ORM does not
+# offer, so async callers run them on Django's shared sync thread.
+aregister_telegram_user = sync_to_async(register_telegram_user)
+aregister_telegram_users = sync_to_async(register_telegram_users)
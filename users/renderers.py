@@ -0,0 +1,45 @@
+"""JSON renderer backed by orjson, falling back to DRF's stdlib renderer."""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional speedup; JSONRenderer is used without it
+    orjson = None
+
+# orjson output is DRF's compact, UTF-8 form; datetimes and dataclasses are left to
+# DRF's encoder so they are formatted exactly as JSONRenderer formats them
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson else 0
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Render JSON with orjson when the output matches what JSONRenderer would produce.
+
+    Indented responses (``; indent=`` in the Accept header, the browsable API),
+    ``UNICODE_JSON = False`` and ``COMPACT_JSON = False`` go through
+    ``JSONRenderer``; types orjson does not know are passed to DRF's encoder.
+    Unlike ``STRICT_JSON`` rendering, NaN and infinities become ``null``.
+    """
+
+    def render(self, data: object, accepted_media_type: str | None = None, renderer_context: dict | None = None) -> bytes:
+        """Render ``data`` into JSON bytes."""
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if (
+            orjson is None
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+            or self.ensure_ascii
+            or not self.compact
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=JSONEncoder().default, option=ORJSON_OPTIONS)
+        # Same escaping as JSONRenderer, so the output is also valid JavaScript
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
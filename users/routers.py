@@ -0,0 +1,65 @@
+"""Database router that shards TelegramUser rows across several databases.
+
+Enabled by listing the shard aliases in ``TELEGRAM_USER_SHARDS`` and this
+router in ``DATABASE_ROUTERS`` (see settings). Every other model stays on
+``default``. A row lives on the shard picked by ``shard_for(telegram_id)``;
+queries that cannot name a ``telegram_id`` must choose a shard with
+``.using()``, since the ``default`` database has no TelegramUser table.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.db.models import Model
+
+TELEGRAM_USER_MODEL = "users.telegramuser"
+
+
+def shard_for(telegram_id: int) -> str:
+    """Return the alias of the shard holding ``telegram_id``.
+
+    A hash rather than a plain modulo, so ids that share a remainder (for
+    example only even ids) still spread evenly.
+    """
+    shards = settings.TELEGRAM_USER_SHARDS
+    digest = hashlib.blake2b(str(telegram_id).encode(), digest_size=8).digest()
+    return shards[int.from_bytes(digest, "big") % len(shards)]
+
+
+def _is_telegram_user(model: type[Model]) -> bool:
+    """Return whether ``model`` is the sharded model."""
+    return model._meta.label_lower == TELEGRAM_USER_MODEL  # noqa: SLF001
+
+
+class TelegramUserShardRouter:
+    """Route TelegramUser to its shard and everything else to ``default``."""
+
+    def db_for_read(self, model: type[Model], **hints: object) -> str | None:
+        """Route reads of a known TelegramUser instance to its shard."""
+        return self._db_for_instance(model, hints)
+
+    def db_for_write(self, model: type[Model], **hints: object) -> str | None:
+        """Route writes of a known TelegramUser instance to its shard."""
+        return self._db_for_instance(model, hints)
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints: object) -> bool | None:  # noqa: ARG002
+        """Forbid relations that would cross from a shard to another database."""
+        if _is_telegram_user(type(obj1)) or _is_telegram_user(type(obj2)):
+            return obj1._state.db == obj2._state.db  # noqa: SLF001
+        return None
+
+    def allow_migrate(self, db: str, app_label: str, model_name: str | None = None, **hints: object) -> bool | None:  # noqa: ARG002
+        """Create the TelegramUser table only on the shards, and nothing else there."""
+        is_telegram_user = f"{app_label}.{model_name}" == TELEGRAM_USER_MODEL
+        if db in settings.TELEGRAM_USER_SHARDS:
+            return is_telegram_user
+        return False if is_telegram_user else None
+
+    def _db_for_instance(self, model: type[Model], hints: dict) -> str | None:
+        """Return the shard of the ``instance`` hint, if it is a TelegramUser."""
+        instance = hints.get("instance")
+        if not _is_telegram_user(model) or instance is None:
+            return None
+        if instance._state.db:  # noqa: SLF001
+            return instance._state.db  # noqa: SLF001
+        return shard_for(instance.telegram_id) if instance.telegram_id is not None else None
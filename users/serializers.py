@@ -1,13 +1,43 @@
 """User serializer for handling user data in the API."""
 
+from collections.abc import Iterable
 from typing import ClassVar
 
 from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from rest_framework import serializers
 
 from .models import TelegramUser
 
 
+class BatchValidationMixin:
+    """Validate lists of payloads with a single serializer instance."""
+
+    @classmethod
+    def validate_many(cls, items: Iterable) -> list[tuple[dict | None, dict | None]]:
+        """Validate payloads one by one, returning ``(validated_data, errors)`` per item.
+
+        Building a ModelSerializer's fields costs far more than validating a
+        payload, so one instance is reused for the whole batch.
+        """
+        serializer = cls()
+        results = []
+        for item in items:
+            try:
+                results.append((serializer.run_validation(item), None))
+            except serializers.ValidationError as exc:
+                errors = exc.detail if isinstance(exc.detail, dict) else {"non_field_errors": exc.detail}
+                results.append((None, errors))
+        return results
+
+
+def normalize_user_data(validated_data: dict) -> dict:
+    """Normalize the username and email of validated user data in place, as ``create_user`` does."""
+    validated_data["username"] = User.normalize_username(validated_data["username"])
+    validated_data["email"] = User.objects.normalize_email(validated_data["email"])
+    return validated_data
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the User model."""
 
@@ -46,7 +76,20 @@ class UserSerializer(serializers.ModelSerializer):
         return instance
 
 
-class TelegramUserSerializer(serializers.ModelSerializer):
+class ProvisionUserSerializer(BatchValidationMixin, UserSerializer):
+    """Serializer for one account in a bulk provisioning batch."""
+
+    class Meta(UserSerializer.Meta):
+        """Meta class for ProvisionUserSerializer."""
+
+        extra_kwargs: ClassVar = {
+            **UserSerializer.Meta.extra_kwargs,
+            # Taken usernames are found with one query for the whole batch
+            "username": {"required": True, "validators": [UnicodeUsernameValidator()]},
+        }
+
+
+class TelegramUserSerializer(BatchValidationMixin, serializers.ModelSerializer):
     """Serializer for the TelegramUser model."""
 
     class Meta:
@@ -54,12 +97,12 @@ class TelegramUserSerializer(serializers.ModelSerializer):
 
         model = TelegramUser
         fields = ["telegram_id", "username", "first_name", "last_name", "language_code"]
+        extra_kwargs: ClassVar = {
+            # Uniqueness is enforced by the upsert itself, not by a lookup per payload.
+            "telegram_id": {"validators": []},
+        }
 
     def create(self, validated_data: dict) -> TelegramUser:
         """Create or update a TelegramUser instance."""
-        telegram_id = validated_data["telegram_id"]
-        return TelegramUser.objects.update_or_create(
-            telegram_id=telegram_id,
-            defaults=validated_data,
-        )[0]
-
+        # Single upsert statement, skipped when nothing changed
+        return TelegramUser.objects.upsert(validated_data)[0]
@@ -0,0 +1,15 @@
+"""Signal handlers for the users app."""
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_profile, user_cache
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_caches(sender: type[User], instance: User, **kwargs: object) -> None:  # noqa: ARG001
+    """Drop cached copies of a user whenever it is saved or deleted."""
+    user_cache.delete(str(instance.pk))
+    invalidate_profile(instance.pk)
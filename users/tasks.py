@@ -1,16 +1,103 @@
 """Tasks for user-related asynchronous operations."""
 
-from celery import shared_task
-from django.core.mail import send_mail
+import logging
+import time
+from functools import cache
+from smtplib import SMTPException
+
+from celery import Task, shared_task
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .models import WelcomeEmailOutbox
+
+logger = logging.getLogger(__name__)
+
+WELCOME_SUBJECT = "Welcome to our platform!"
+WELCOME_FROM_EMAIL = "your_email@example.com"
+
+
+@cache
+def welcome_email_body() -> str:
+    """Render the welcome email body once per process."""
+    return render_to_string("users/welcome_email.txt")
 
 
 @shared_task
 def send_welcome_email(email: str) -> str:
     """Send a welcome email to the given address."""
     send_mail(
-        subject="Welcome to our platform!",
-        message="Hi there! Thanks for registering.",
-        from_email="your_email@example.com",
+        subject=WELCOME_SUBJECT,
+        message=welcome_email_body(),
+        from_email=WELCOME_FROM_EMAIL,
         recipient_list=[email],
     )
     return f"Email sent to {email}"
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=5)
+def send_welcome_emails(self: Task, emails: list[str]) -> dict:
+    """Send welcome emails to many addresses over a single mail connection.
+
+    Messages go out in groups of ``WELCOME_EMAIL_BATCH_SIZE`` through one
+    backend connection, so a signup spike costs one SMTP handshake per task
+    rather than one per user. Returns the throughput of the run.
+
+    The outbox rows are already gone when this runs, so the task is
+    acknowledged only once it finishes (a crashed worker's batch is
+    redelivered). On a mail error the groups not yet sent are retried with
+    exponential backoff, and after the last retry put back in the outbox.
+    """
+    started = time.perf_counter()
+    body = welcome_email_body()
+    batch_size = settings.WELCOME_EMAIL_BATCH_SIZE
+    sent = done = 0
+    try:
+        with get_connection() as connection:
+            for done in range(0, len(emails), batch_size):
+                messages = [
+                    EmailMessage(WELCOME_SUBJECT, body, WELCOME_FROM_EMAIL, [email], connection=connection)
+                    for email in emails[done:done + batch_size]
+                ]
+                sent += connection.send_messages(messages) or 0
+    except (SMTPException, OSError) as exc:
+        unsent = emails[done:]
+        if self.request.retries >= self.max_retries:
+            WelcomeEmailOutbox.objects.bulk_create(WelcomeEmailOutbox(email=email) for email in unsent)
+            logger.exception("Returned %d welcome emails to the outbox after %d retries", len(unsent), self.max_retries)
+            raise
+        countdown = settings.WELCOME_EMAIL_RETRY_DELAY * 2 ** self.request.retries
+        raise self.retry(args=[unsent], exc=exc, countdown=countdown) from exc
+    elapsed = time.perf_counter() - started
+    per_second = sent / elapsed if elapsed else 0.0
+    logger.info("Sent %d welcome emails in %.3fs (%.1f/s)", sent, elapsed, per_second)
+    return {"sent": sent, "seconds": round(elapsed, 3), "per_second": round(per_second, 1)}
+
+
+@shared_task
+def relay_welcome_emails() -> int:
+    """Move pending welcome emails from the outbox to ``send_welcome_emails``.
+
+    Each batch of ``WELCOME_EMAIL_RELAY_BATCH_SIZE`` rows is enqueued as one
+    task and deleted in the same transaction, so rows are only removed once
+    the broker has accepted them (a broker failure leaves them for the next
+    run); from then on the task's retries keep them. Returns the number of
+    emails relayed.
+    """
+    batch_size = settings.WELCOME_EMAIL_RELAY_BATCH_SIZE
+    relayed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                WelcomeEmailOutbox.objects.select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", "email")[:batch_size],
+            )
+            if rows:
+                send_welcome_emails.delay([email for _, email in rows])
+                WelcomeEmailOutbox.objects.filter(id__in=[pk for pk, _ in rows]).delete()
+        relayed += len(rows)
+        if len(rows) < batch_size:
+            return relayed
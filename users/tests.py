@@ -1,8 +1,72 @@
 """Test cases for the users app."""
 
+import copy
+import datetime
+import decimal
+import json
+import os
+import pstats
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from pathlib import Path
+from smtplib import SMTPException
+from typing import ClassVar
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.mail import get_connection
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.db import (
+    DatabaseError,
+    OperationalError,
+    connection,
+    connections,
+    transaction,
+)
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from klb_assignment.metrics import MetricsMiddleware
+from klb_assignment.profiling import RequestProfilingMiddleware
+
+from . import idempotency
+from .activity import (
+    ActivityBuffer,
+    _flush_periodically,
+    activity,
+    flush_activity,
+    start_flusher,
+)
+from .caching import TTLCache, user_cache
+from .hashers import hash_passwords, hash_pool
+from .management.commands import calibrate_password_hasher, loadbench
+from .models import TelegramUser, WelcomeEmailOutbox
+from .pagination import EstimatedCountPaginator
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .routers import shard_for
+from .serializers import UserSerializer
+from .tasks import relay_welcome_emails, send_welcome_emails
 
 
 class RegisterViewTest(APITestCase):
@@ -27,6 +91,7 @@ class RegisterViewTest(APITestCase):
         assert response.data["username"] == self.user_data["username"]
         assert response.data["email"] == self.user_data["email"]
         assert "password" not in response.data
+        assert list(WelcomeEmailOutbox.objects.values_list("email", flat=True)) == [self.user_data["email"]]
 
     def test_register_missing_fields(self) -> None:
         """Test registration with missing required fields."""
@@ -88,6 +153,8 @@ class TelegramRegisterViewTest(APITestCase):
         """Set up test data and client for Telegram registration."""
         self.client = APIClient()
         self.url = reverse("telegram-register")
+        activity.clear()  # no flush of earlier tests' touches inside the query counts
+        caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS].clear()  # no replays of earlier tests' registrations
         self.valid_data = {
             "telegram_id": 123456789,
             "username": "telegramuser",
@@ -122,3 +189,1371 @@ class TelegramRegisterViewTest(APITestCase):
         response2 = self.client.post(self.url, data2, format="json")
         assert response2.status_code == status.HTTP_201_CREATED
         assert response2.data["message"] == "Telegram user saved."
+        assert TelegramUser.objects.get(telegram_id=self.valid_data["telegram_id"]).username == "newusername"
+
+    def test_telegram_register_query_count(self) -> None:
+        """Test that every registration is one upsert statement."""
+        with self.assertNumQueries(1):
+            self.client.post(self.url, self.valid_data, format="json")
+        # A fresh Idempotency-Key gets past deduplication
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, self.valid_data, format="json", headers={"Idempotency-Key": "retry-1"})
+        assert response.status_code == status.HTTP_201_CREATED
+        data = self.valid_data.copy()
+        data["first_name"] = "Changed"
+        with self.assertNumQueries(1):
+            self.client.post(self.url, data, format="json")
+        assert TelegramUser.objects.get(telegram_id=data["telegram_id"]).first_name == "Changed"
+
+    def test_upsert_skips_unchanged_rows(self) -> None:
+        """Test that the upsert only writes when a given field differs."""
+        assert TelegramUser.objects.upsert(self.valid_data)[1] is True
+        assert TelegramUser.objects.upsert(self.valid_data)[1] is False
+        partial = {"telegram_id": self.valid_data["telegram_id"], "username": self.valid_data["username"]}
+        assert TelegramUser.objects.upsert(partial)[1] is False
+        assert TelegramUser.objects.upsert({**partial, "username": "renamed"})[1] is True
+        user = TelegramUser.objects.get(telegram_id=self.valid_data["telegram_id"])
+        assert (user.username, user.first_name) == ("renamed", "Tele")
+        # A partial write leaves the stored digest unknown, so a full payload rewrites it
+        assert user.fingerprint == ""
+        assert TelegramUser.objects.upsert({**self.valid_data, "username": "renamed"})[1] is True
+
+    def test_telegram_register_partial_keeps_fields(self) -> None:
+        """Test that fields missing from the payload keep their stored values."""
+        self.client.post(self.url, self.valid_data, format="json")
+        data = {"telegram_id": self.valid_data["telegram_id"], "username": "renamed"}
+        response = self.client.post(self.url, data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        user = TelegramUser.objects.get(telegram_id=self.valid_data["telegram_id"])
+        assert user.username == "renamed"
+        assert user.first_name == self.valid_data["first_name"]
+
+    def test_duplicate_answered_from_cache(self) -> None:
+        """Test that a repeated payload is answered with the stored response and no queries."""
+        first = self.client.post(self.url, self.valid_data, format="json")
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, self.valid_data, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data == first.data
+        assert response["Idempotent-Replayed"] == "true"
+        # The replay skips the write but still records the interaction
+        assert len(activity) == 1
+        activity.flush()
+        assert TelegramUser.objects.get(telegram_id=self.valid_data["telegram_id"]).interaction_count == 2  # noqa: PLR2004
+
+    def test_superseded_payload_is_saved_again(self) -> None:
+        """Test that A, B, A within the TTL stores A, whether B came singly or in bulk."""
+        changed = {**self.valid_data, "first_name": "Changed"}
+        for save_changed in (
+            lambda: self.client.post(self.url, changed, format="json"),
+            lambda: self.client.post(reverse("telegram-register-bulk"), [changed], format="json"),
+        ):
+            self.client.post(self.url, self.valid_data, format="json")
+            save_changed()
+            assert TelegramUser.objects.get(telegram_id=self.valid_data["telegram_id"]).first_name == "Changed"
+            response = self.client.post(self.url, self.valid_data, format="json")
+            assert response.status_code == status.HTTP_201_CREATED
+            assert "Idempotent-Replayed" not in response
+            assert TelegramUser.objects.get(telegram_id=self.valid_data["telegram_id"]).first_name == "Tele"
+        # Once it is the latest again, the payload is deduplicated as before
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, self.valid_data, format="json")
+        assert response["Idempotent-Replayed"] == "true"
+
+    def test_idempotency_key(self) -> None:
+        """Test that a key is replayed for its own payload only."""
+        headers = {"Idempotency-Key": "start-1"}
+        self.client.post(self.url, self.valid_data, format="json", headers=headers)
+        changed = {**self.valid_data, "first_name": "Changed"}
+        response = self.client.post(self.url, changed, format="json", headers=headers)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+        assert TelegramUser.objects.get(telegram_id=self.valid_data["telegram_id"]).first_name == "Tele"
+
+    def test_failed_registration_is_retried(self) -> None:
+        """Test that an invalid payload is not cached, so a retry is validated again."""
+        data = {**self.valid_data, "telegram_id": "not-a-number"}
+        for _ in range(2):
+            response = self.client.post(self.url, data, format="json")
+            assert response.status_code == status.HTTP_400_BAD_REQUEST
+            assert "Idempotent-Replayed" not in response
+
+    def test_concurrent_duplicates(self) -> None:
+        """Test that duplicates arriving while the first runs get 409 and never reach the view."""
+        entered, finish = threading.Event(), threading.Event()
+        calls = []
+
+        def slow_save(data: dict) -> tuple[int, dict]:
+            calls.append(data)
+            entered.set()
+            finish.wait(timeout=5)
+            return status.HTTP_201_CREATED, {"message": "Telegram user saved."}
+
+        def post() -> object:
+            return APIClient().post(self.url, self.valid_data, format="json")
+
+        with mock.patch("users.registration.save_telegram_user", side_effect=slow_save), \
+                ThreadPoolExecutor(max_workers=9) as pool:
+            first = pool.submit(post)
+            assert entered.wait(timeout=5)
+            duplicates = list(pool.map(lambda _: post(), range(8)))
+            finish.set()
+            assert first.result().status_code == status.HTTP_201_CREATED
+            replayed = post()
+        assert len(calls) == 1
+        assert {response.status_code for response in duplicates} == {status.HTTP_409_CONFLICT}
+        assert all(response["Retry-After"] == "1" for response in duplicates)
+        assert replayed.status_code == status.HTTP_201_CREATED
+        assert replayed["Idempotent-Replayed"] == "true"
+
+    def test_concurrent_claims(self) -> None:
+        """Test that exactly one of many simultaneous duplicates claims the key."""
+        key, fingerprint = idempotency.dedup_key(1, self.valid_data, None)
+        barrier = threading.Barrier(16, timeout=5)
+
+        def claim(_: int) -> object:
+            barrier.wait()
+            return idempotency.claim(key, fingerprint)
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            replays = list(pool.map(claim, range(16)))
+        assert replays.count(None) == 1
+        assert {replay.status for replay in replays if replay} == {status.HTTP_409_CONFLICT}
+
+
+class TelegramBulkRegisterViewTest(APITestCase):
+    """Tests for the TelegramBulkRegisterView (batched Telegram registration endpoint)."""
+
+    def setUp(self) -> None:
+        """Set up test data and client for bulk Telegram registration."""
+        self.client = APIClient()
+        self.url = reverse("telegram-register-bulk")
+        activity.clear()  # no flush of earlier tests' touches inside the query counts
+        self.items = [
+            {"telegram_id": 1000 + i, "username": f"user{i}", "first_name": "Tele", "language_code": "en"}
+            for i in range(5)
+        ]
+
+    def test_bulk_register_creates_and_updates(self) -> None:
+        """Test that new users are created and existing ones updated in place."""
+        TelegramUser.objects.create(telegram_id=1000, username="old")
+        response = self.client.post(self.url, self.items, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["saved"] == len(self.items)
+        statuses = [result["status"] for result in response.data["results"]]
+        assert statuses == ["updated", "created", "created", "created", "created"]
+        assert TelegramUser.objects.count() == len(self.items)
+        assert TelegramUser.objects.get(telegram_id=1000).username == "user0"
+
+    def test_bulk_register_skips_unchanged(self) -> None:
+        """Test that rows identical to the stored ones are not rewritten."""
+        self.client.post(self.url, self.items, format="json")
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, self.items, format="json")
+        statuses = {result["status"] for result in response.data["results"]}
+        assert statuses == {"unchanged"}
+
+    def test_bulk_register_reports_invalid_items(self) -> None:
+        """Test that invalid items are reported without blocking valid ones."""
+        items = [*self.items[:2], {"username": "no-id"}]
+        response = self.client.post(self.url, items, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["saved"] == 2  # noqa: PLR2004
+        invalid = response.data["results"][2]
+        assert invalid["status"] == "invalid"
+        assert "telegram_id" in invalid["errors"]
+
+    @override_settings(TELEGRAM_BULK_CHUNK_SIZE=2)
+    def test_bulk_register_chunked_queries(self) -> None:
+        """Test that each chunk costs a lookup and a single upsert statement."""
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, self.items, format="json")
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_bulk_register_rejects_non_list(self) -> None:
+        """Test that a non-list body is rejected."""
+        response = self.client.post(self.url, self.items[0], format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    @override_settings(TELEGRAM_BULK_MAX_ITEMS=2)
+    def test_bulk_register_too_many_items(self) -> None:
+        """Test that oversized batches are rejected."""
+        response = self.client.post(self.url, self.items, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class SendWelcomeEmailsTaskTest(TestCase):
+    """Tests for the batched send_welcome_emails task."""
+
+    @override_settings(WELCOME_EMAIL_BATCH_SIZE=2)
+    def test_batch_reuses_one_connection(self) -> None:
+        """Test that all messages go out over a single backend connection."""
+        emails = [f"user{i}@example.com" for i in range(5)]
+        with mock.patch("users.tasks.get_connection", wraps=get_connection) as connect:
+            result = send_welcome_emails(emails)
+        connect.assert_called_once()
+        assert result["sent"] == len(emails)
+        assert [message.to for message in mail.outbox] == [[email] for email in emails]
+        assert mail.outbox[0].body == "Hi there! Thanks for registering."
+
+    @override_settings(WELCOME_EMAIL_BATCH_SIZE=2)
+    def test_mail_error_retries_unsent_groups(self) -> None:
+        """Test that a failed group is retried with the rest, without resending earlier groups."""
+        emails = [f"retry{i}@example.com" for i in range(5)]
+        send = locmem.EmailBackend.send_messages
+        calls = []
+
+        def flaky(backend: locmem.EmailBackend, messages: list) -> int:
+            calls.append([message.to[0] for message in messages])
+            if len(calls) == 2:  # noqa: PLR2004
+                raise SMTPException("busy")
+            return send(backend, messages)
+
+        with mock.patch.object(locmem.EmailBackend, "send_messages", autospec=True, side_effect=flaky):
+            result = send_welcome_emails.apply(args=[emails])
+        assert result.successful()
+        assert calls == [emails[:2], emails[2:4], emails[2:4], emails[4:]]
+        assert sorted(message.to[0] for message in mail.outbox) == emails
+
+    def test_mail_outage_returns_emails_to_outbox(self) -> None:
+        """Test that emails still unsent after the last retry go back to the outbox."""
+        emails = ["down0@example.com", "down1@example.com"]
+        with mock.patch.object(locmem.EmailBackend, "send_messages", side_effect=OSError("unreachable")), \
+                self.assertLogs("users.tasks", "ERROR"):
+            result = send_welcome_emails.apply(args=[emails])
+        assert result.failed()
+        assert sorted(WelcomeEmailOutbox.objects.values_list("email", flat=True)) == emails
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    """Tests for CachedJWTAuthentication (JWT user resolution through a cache)."""
+
+    def setUp(self) -> None:
+        """Create a user and authenticate the client with an access token."""
+        user_cache.clear()
+        self.user = User.objects.create_user("cached", "cached@example.com", "testpass789")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.profile_url = reverse("profile")
+
+    def test_user_loaded_once(self) -> None:
+        """Test that only the first authenticated request queries the user."""
+        with self.assertNumQueries(1):
+            self.client.get(self.profile_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.profile_url)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_serializer_update_invalidates(self) -> None:
+        """Test that saving through UserSerializer.update drops the cached user."""
+        self.client.get(self.profile_url)
+        serializer = UserSerializer(self.user, data={"email": "new@example.com"}, partial=True)
+        assert serializer.is_valid()
+        serializer.save()
+        response = self.client.get(self.profile_url)
+        assert response.data["email"] == "new@example.com"
+
+    def test_deactivated_user_rejected(self) -> None:
+        """Test that a deactivated user is rejected even after being cached."""
+        self.client.get(self.profile_url)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.profile_url)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class TTLCacheTest(TestCase):
+    """Tests for the TTLCache helper."""
+
+    def test_evicts_least_recently_used(self) -> None:
+        """Test that the cache stays within its size bound."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert len(cache) == 2  # noqa: PLR2004
+
+    def test_entries_expire(self) -> None:
+        """Test that entries are dropped once their TTL has passed."""
+        cache = TTLCache(maxsize=2, ttl=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+
+class ProfileETagTest(APITestCase):
+    """Tests for ProfileView's cached representation and conditional GET."""
+
+    def setUp(self) -> None:
+        """Create a user and authenticate the client with an access token."""
+        self.user = User.objects.create_user("etag", "etag@example.com", "testpass789")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.profile_url = reverse("profile")
+
+    def test_matching_etag_returns_304(self) -> None:
+        """Test that a matching If-None-Match gets an empty 304."""
+        response = self.client.get(self.profile_url)
+        etag = response["ETag"]
+        response = self.client.get(self.profile_url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+        assert not response.content
+
+    def test_stale_etag_returns_profile(self) -> None:
+        """Test that a non-matching If-None-Match gets the full profile."""
+        response = self.client.get(self.profile_url, headers={"If-None-Match": '"stale"'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["username"] == "etag"
+
+    def test_serializer_update_changes_etag(self) -> None:
+        """Test that saving through UserSerializer.update invalidates the cached profile."""
+        etag = self.client.get(self.profile_url)["ETag"]
+        serializer = UserSerializer(self.user, data={"first_name": "Changed"}, partial=True)
+        assert serializer.is_valid()
+        serializer.save()
+        response = self.client.get(self.profile_url, headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["first_name"] == "Changed"
+        assert response["ETag"] != etag
+
+
+class AsyncRegisterViewTest(TestCase):
+    """Tests for the async-native registration endpoints."""
+
+    def setUp(self) -> None:
+        """Set up endpoint URLs and payloads."""
+        caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS].clear()
+        self.register_url = reverse("register-async")
+        self.telegram_url = reverse("telegram-register-async")
+        self.user_data = {
+            "username": "asyncuser",
+            "email": "asyncuser@example.com",
+            "password": "testpass123",
+        }
+
+    async def test_register_success(self) -> None:
+        """Test that a user is created with a hashed password and a queued welcome email."""
+        response = await self.async_client.post(self.register_url, self.user_data, content_type="application/json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert "password" not in response.json()
+        user = await User.objects.aget(username="asyncuser")
+        assert await sync_to_async(user.check_password)("testpass123")
+        assert await WelcomeEmailOutbox.objects.filter(email="asyncuser@example.com").aexists()
+
+    async def test_register_invalid(self) -> None:
+        """Test that validation errors are returned as 400."""
+        await User.objects.acreate(username="asyncuser")
+        response = await self.async_client.post(self.register_url, self.user_data, content_type="application/json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "username" in response.json()
+
+    async def test_telegram_register(self) -> None:
+        """Test that the async endpoint creates and then updates a Telegram user."""
+        data = {"telegram_id": 42, "username": "first"}
+        response = await self.async_client.post(self.telegram_url, data, content_type="application/json")
+        assert response.status_code == status.HTTP_201_CREATED
+        data["username"] = "second"
+        await self.async_client.post(self.telegram_url, data, content_type="application/json")
+        user = await TelegramUser.objects.aget(telegram_id=42)
+        assert user.username == "second"
+
+    async def test_telegram_register_duplicate(self) -> None:
+        """Test that a repeated registration is replayed without reaching the database."""
+        data = {"telegram_id": 43, "username": "spam"}
+        await self.async_client.post(self.telegram_url, data, content_type="application/json")
+        await TelegramUser.objects.filter(telegram_id=43).adelete()
+        response = await self.async_client.post(self.telegram_url, data, content_type="application/json")
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response["Idempotent-Replayed"] == "true"
+        assert not await TelegramUser.objects.filter(telegram_id=43).aexists()
+
+    async def test_telegram_register_missing_telegram_id(self) -> None:
+        """Test that telegram_id is required."""
+        response = await self.async_client.post(self.telegram_url, {"username": "x"}, content_type="application/json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["error"] == "telegram_id is required."
+
+
+class LoadBenchCommandTest(TestCase):
+    """Tests for the loadbench management command."""
+
+    def test_reports_scenarios_as_json(self) -> None:
+        """Test that each scenario reports throughput, latency and query counts."""
+        out = StringIO()
+        call_command(
+            "loadbench", "--no-test-db", "--concurrency", "1", "--requests", "3", "--bulk-size", "2",
+            "--scenarios", "profile", "telegram_register", "telegram_register_bulk",
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        assert set(report["scenarios"]) == {"profile", "telegram_register", "telegram_register_bulk"}
+        for summary in report["scenarios"].values():
+            assert summary["requests"] == 3  # noqa: PLR2004
+            assert summary["errors"] == 0
+            assert summary["p99_ms"] >= summary["p50_ms"]
+        assert report["scenarios"]["telegram_register"]["queries_per_request"] > 0
+        assert TelegramUser.objects.count() == 3 + 3 * 2
+
+    def test_environment_restores_connection_settings(self) -> None:
+        """Test that the throwaway-database setup leaves the connection settings as it found them."""
+        before = copy.deepcopy(connection.settings_dict)
+        with mock.patch.object(loadbench, "setup_databases") as setup, \
+                mock.patch.object(loadbench, "teardown_databases"):
+            with loadbench.in_process_environment(use_test_db=True):
+                setup.assert_called_once()
+                assert connection.settings_dict["TEST"]["NAME"] != before["TEST"]["NAME"]
+                assert connection.settings_dict["OPTIONS"]["transaction_mode"] == "IMMEDIATE"
+            assert connection.settings_dict == before
+
+
+class BotBenchCommandTest(TransactionTestCase):
+    """Tests for the botbench management command.
+
+    Both modes save from asyncio's worker threads, outside the test's transaction.
+    """
+
+    def setUp(self) -> None:
+        """Start from an empty activity buffer, without a background flush thread."""
+        activity.clear()
+        patcher = mock.patch("telegram_bot.inprocess.start_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reports_both_modes(self) -> None:
+        """Test that both registration modes save every user and report throughput."""
+        out = StringIO()
+        call_command("botbench", "--no-test-db", "--registrations", "6", "--batch-size", "4", stdout=out)
+        report = json.loads(out.getvalue())
+        assert set(report["modes"]) == {"http", "inprocess"}
+        assert report["speedup"] > 0
+        assert TelegramUser.objects.count() == 2 * 6
+
+
+class MetricsEndpointTest(APITestCase):
+    """Tests for the metrics middleware and the /metrics endpoint."""
+
+    def setUp(self) -> None:
+        """Start without cached registrations, with task metrics in a temporary directory."""
+        caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS].clear()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.metrics_dir = tmpdir.name
+        metrics_cache = override_settings(CACHES={
+            **settings.CACHES,
+            settings.METRICS_CACHE_ALIAS: {**settings.CACHES[settings.METRICS_CACHE_ALIAS], "LOCATION": self.metrics_dir},
+        })
+        metrics_cache.enable()
+        self.addCleanup(metrics_cache.disable)
+
+    def sample(self, body: str, series: str) -> float:
+        """Return the value of ``series`` in a scrape, or fail if it is missing."""
+        for line in body.splitlines():
+            name, _, value = line.rpartition(" ")
+            if name == series:
+                return float(value)
+        self.fail(f"{series} not exported")
+        return 0.0
+
+    def test_request_metrics_exposed(self) -> None:
+        """Test that per-route latency, query and size series are exported."""
+        self.client.post(reverse("telegram-register"), {"telegram_id": 7, "username": "metrics"}, format="json")
+        response = self.client.get(reverse("metrics"))
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        body = response.content.decode()
+        labels = 'route="api/telegram/register/",method="POST"'
+        assert f'http_requests_total{{{labels},status="201"}}' in body
+        assert f"http_request_duration_seconds_count{{{labels}}}" in body
+        assert self.sample(body, f"http_request_db_queries_sum{{{labels}}}") > 0
+        assert self.sample(body, f"http_request_db_duration_seconds_sum{{{labels}}}") > 0
+        assert f"http_response_size_bytes_sum{{{labels}}}" in body
+
+    def test_task_duration_exposed(self) -> None:
+        """Test that task run times recorded in a worker process are served by the web process."""
+        worker = (
+            "import django; django.setup(); from users.tasks import send_welcome_email; "
+            "[send_welcome_email.apply(args=['metrics@example.com']) for _ in range(2)]"
+        )
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "klb_assignment.settings_worker",
+            "METRICS_CACHE_LOCATION": self.metrics_dir,
+        }
+        subprocess.run([sys.executable, "-c", worker], env=env, cwd=settings.BASE_DIR, check=True, capture_output=True)  # noqa: S603
+        body = self.client.get(reverse("metrics")).content.decode()
+        labels = 'task="users.tasks.send_welcome_email",state="SUCCESS"'
+        assert self.sample(body, f"celery_task_duration_seconds_count{{{labels}}}") == 2  # noqa: PLR2004
+        assert self.sample(body, f'celery_task_duration_seconds_bucket{{{labels},le="+Inf"}}') == 2  # noqa: PLR2004
+        assert self.sample(body, f"celery_task_duration_seconds_sum{{{labels}}}") > 0
+
+    def test_metrics_restricted(self) -> None:
+        """Test that only allowlisted addresses or the bearer token can scrape /metrics."""
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.1"], METRICS_TOKEN="scrape"):  # noqa: S106
+            assert self.client.get(reverse("metrics")).status_code == status.HTTP_403_FORBIDDEN
+            wrong = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer nope"})
+            assert wrong.status_code == status.HTTP_403_FORBIDDEN
+            with_token = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer scrape"})
+            assert with_token.status_code == status.HTTP_200_OK
+            from_allowed = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1")
+            assert from_allowed.status_code == status.HTTP_200_OK
+
+    async def test_async_requests_stay_on_event_loop(self) -> None:
+        """Test that the middleware runs natively in an async chain and still records requests."""
+
+        async def get_response(request: object) -> object:
+            return request
+
+        assert iscoroutinefunction(MetricsMiddleware(get_response))
+        response = await self.async_client.post(
+            reverse("telegram-register-async"), {"telegram_id": 8, "username": "am"}, content_type="application/json",
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        body = (await self.async_client.get(reverse("metrics"))).content.decode()
+        labels = 'route="api/async/telegram/register/",method="POST"'
+        assert f'http_requests_total{{{labels},status="201"}}' in body
+        # The view's queries run in a sync_to_async thread and are still counted
+        assert self.sample(body, f"http_request_db_queries_sum{{{labels}}}") > 0
+        assert self.sample(body, f"http_request_db_duration_seconds_sum{{{labels}}}") > 0
+
+
+class RequestProfilingMiddlewareTest(APITestCase):
+    """Tests for the opt-in per-request profiling middleware."""
+
+    def setUp(self) -> None:
+        """Enable profiling into a temporary directory, triggered by header only."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.directory = Path(self.tmpdir.name)
+        activity.clear()
+        caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS].clear()  # no replays of earlier tests' registrations
+        profiling = override_settings(
+            REQUEST_PROFILING_ENABLED=True,
+            REQUEST_PROFILING_DIR=self.directory,
+            REQUEST_PROFILING_TOKEN="s3cret",  # noqa: S106
+            REQUEST_PROFILING_SAMPLE_RATE=0.0,
+        )
+        profiling.enable()
+        self.addCleanup(profiling.disable)
+
+    def register(self, **headers: str) -> object:
+        """POST a Telegram registration with ``headers``."""
+        return self.client.post(
+            reverse("telegram-register"), {"telegram_id": 9, "username": "profiled"}, format="json", headers=headers,
+        )
+
+    def test_header_writes_profile_and_sql_log(self) -> None:
+        """Test that a request with the token leaves a cProfile dump and a SQL log named after the view."""
+        response = self.register(**{"X-Profile-Request": "s3cret"})
+        assert response.status_code == status.HTTP_201_CREATED
+        profile_id = response["X-Profile-Id"]
+        assert "-telegram-register-" in profile_id
+        stats = pstats.Stats(str(self.directory / f"{profile_id}.prof"))
+        assert any(name == "post" for _, _, name in stats.stats)
+        report = json.loads((self.directory / f"{profile_id}.json").read_text())
+        assert report["view"] == "telegram-register"
+        assert report["status"] == status.HTTP_201_CREATED
+        assert report["query_count"] == len(report["queries"]) > 0
+        assert any("users_telegramuser" in query["sql"] for query in report["queries"])
+
+    def test_unselected_requests_are_not_profiled(self) -> None:
+        """Test that requests without the right token, or unsampled, are left alone."""
+        for headers in ({}, {"X-Profile-Request": "wrong"}):
+            response = self.register(**headers)
+            assert "X-Profile-Id" not in response
+        assert list(self.directory.iterdir()) == []
+
+    def test_sampling(self) -> None:
+        """Test that a sample rate of 1 profiles every request."""
+        with override_settings(REQUEST_PROFILING_SAMPLE_RATE=1.0):
+            self.client = self.client_class()
+            response = self.client.get(reverse("metrics"))
+        assert (self.directory / f"{response['X-Profile-Id']}.json").exists()
+
+    def test_disabled_middleware_leaves_chain(self) -> None:
+        """Test that the middleware removes itself when profiling is disabled."""
+        with override_settings(REQUEST_PROFILING_ENABLED=False), self.assertRaises(MiddlewareNotUsed):  # noqa: PT027
+            RequestProfilingMiddleware(lambda request: request)
+
+
+class SQLiteProductionProfileTest(TestCase):
+    """Tests for the opt-in SQLite production database profile."""
+
+    WRITERS = 4
+    WRITES_PER_WRITER = 25
+
+    def setUp(self) -> None:
+        """Set up a plain and a tuned file-backed database."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        engine = "django.db.backends.sqlite3"
+        self.handler = ConnectionHandler({
+            "default": {"ENGINE": engine, "NAME": f"{self.tmpdir.name}/plain.sqlite3"},
+            "tuned": {"ENGINE": engine, "NAME": f"{self.tmpdir.name}/tuned.sqlite3", **settings.SQLITE_PRODUCTION_PROFILE},
+        })
+        for alias in self.handler:
+            with self.handler[alias].cursor() as cursor:
+                cursor.execute("CREATE TABLE hits (id INTEGER PRIMARY KEY, payload TEXT)")
+            self.handler[alias].close()
+
+    def test_pragmas_applied(self) -> None:
+        """Test that each connection gets the profile's journal mode, sync level, busy timeout and caches."""
+        profile = settings.SQLITE_PRODUCTION_PROFILE
+        pragmas = profile["PRAGMAS"]
+        expected = {
+            "journal_mode": pragmas["journal_mode"],
+            "synchronous": {"off": 0, "normal": 1, "full": 2, "extra": 3}[pragmas["synchronous"]],
+            "busy_timeout": profile["OPTIONS"]["timeout"] * 1000,
+            "mmap_size": pragmas["mmap_size"],
+            "cache_size": pragmas["cache_size"],
+            "temp_store": 2,  # MEMORY
+        }
+        with self.handler["tuned"].cursor() as cursor:
+            for name, value in expected.items():
+                cursor.execute(f"PRAGMA {name}")
+                assert cursor.fetchone()[0] == value, name
+        assert self.handler["tuned"].settings_dict["OPTIONS"]["transaction_mode"] == "IMMEDIATE"
+        self.handler["tuned"].close()
+
+    def run_writers(self, alias: str) -> tuple[int, list[Exception]]:
+        """Run read-then-write transactions from several threads; return the rows committed and the errors."""
+        errors = []
+
+        def writer() -> None:
+            conn = self.handler[alias]
+            try:
+                for _ in range(self.WRITES_PER_WRITER):
+                    try:
+                        with transaction.atomic(using=alias), conn.cursor() as cursor:
+                            cursor.execute("SELECT COUNT(*) FROM hits")
+                            time.sleep(0.001)  # let the other writers' transactions overlap this one
+                            cursor.execute("INSERT INTO hits (payload) VALUES ('x')")
+                    except OperationalError as exc:
+                        errors.append(exc)
+            finally:
+                conn.close()
+
+        # Open the transactions on this test's handler, honouring each alias's transaction_mode
+        with mock.patch("django.db.transaction.connections", self.handler):
+            threads = [threading.Thread(target=writer) for _ in range(self.WRITERS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        with self.handler[alias].cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM hits")
+            committed = cursor.fetchone()[0]
+        self.handler[alias].close()
+        return committed, errors
+
+    def test_concurrent_writers_all_commit(self) -> None:
+        """Test that overlapping writers all commit on the profile but hit lock errors on plain SQLite.
+
+        Deferred transactions that read before writing deadlock on the lock
+        upgrade, which SQLite reports at once whatever the busy timeout; the
+        profile's IMMEDIATE transactions queue on the busy timeout instead.
+        """
+        committed, errors = self.run_writers("tuned")
+        if errors:
+            raise errors[0]
+        assert committed == self.WRITERS * self.WRITES_PER_WRITER
+
+        committed, errors = self.run_writers("default")
+        assert errors
+        assert all("locked" in str(error) for error in errors)
+        assert committed == self.WRITERS * self.WRITES_PER_WRITER - len(errors)
+
+
+class TelegramUserExportViewTest(APITestCase):
+    """Tests for the TelegramUserExportView (streaming export endpoint)."""
+
+    def setUp(self) -> None:
+        """Create Telegram users and an authenticated staff client."""
+        TelegramUser.objects.bulk_create(
+            TelegramUser(telegram_id=500 + i, username=f"export{i}", language_code="en") for i in range(5)
+        )
+        self.url = reverse("telegram-export")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("staff", is_staff=True))
+
+    @override_settings(TELEGRAM_EXPORT_CHUNK_SIZE=2)
+    def test_csv_export_keyset_pages(self) -> None:
+        """Test that the CSV export streams every row, one query per page."""
+        response = self.client.get(self.url)
+        assert response.streaming
+        assert response["Content-Type"] == "text/csv"
+        with self.assertNumQueries(3):
+            lines = b"".join(response.streaming_content).decode().splitlines()
+        assert lines[0] == "id,telegram_id,username,first_name,last_name,language_code"
+        assert [line.split(",")[2] for line in lines[1:]] == [f"export{i}" for i in range(5)]
+
+    def test_ndjson_export(self) -> None:
+        """Test that the NDJSON export emits one object per line."""
+        response = self.client.get(self.url, {"output": "ndjson"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        assert len(rows) == 5  # noqa: PLR2004
+        assert rows[0]["telegram_id"] == 500  # noqa: PLR2004
+
+    def test_unknown_output_rejected(self) -> None:
+        """Test that unsupported output formats are rejected."""
+        response = self.client.get(self.url, {"output": "xml"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_non_staff_forbidden(self) -> None:
+        """Test that regular users cannot export."""
+        self.client.force_authenticate(User.objects.create_user("regular"))
+        response = self.client.get(self.url)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+class TelegramUserListViewTest(APITestCase):
+    """Tests for the TelegramUserListView (cursor-paginated list and search)."""
+
+    def setUp(self) -> None:
+        """Create Telegram users and an authenticated staff client."""
+        names = ["alice", "alina", "bob", "albert", "carol", "alfred", "dave"]
+        TelegramUser.objects.bulk_create(
+            TelegramUser(telegram_id=700 + i, username=name, language_code="en" if i % 2 else "de")
+            for i, name in enumerate(names)
+        )
+        self.url = reverse("telegram-users")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("staff", is_staff=True))
+
+    def test_cursor_pages_cover_all_rows(self) -> None:
+        """Test that following next links visits every row once, one query per page."""
+        seen = []
+        url = f"{self.url}?page_size=3"
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            seen += [row["telegram_id"] for row in response.data["results"]]
+            url = response.data["next"]
+        assert seen == list(range(700, 707))
+
+    def test_filter_language_and_username_prefix(self) -> None:
+        """Test filtering by language_code and username prefix."""
+        response = self.client.get(self.url, {"username": "al"})
+        assert [row["username"] for row in response.data["results"]] == ["albert", "alfred", "alice", "alina"]
+        response = self.client.get(self.url, {"username": "al", "language_code": "en"})
+        assert [row["username"] for row in response.data["results"]] == ["albert", "alfred", "alina"]
+
+    def test_prefix_pages_follow_username_index(self) -> None:
+        """Test that prefix pages are walked in (username, id) order without sorting the matches."""
+        seen = []
+        url = f"{self.url}?username=al&page_size=3"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            seen += [row["username"] for row in response.data["results"]]
+            url = response.data["next"]
+            plan = connection.ops.explain_query_prefix() + " " + queries[0]["sql"]
+            with connection.cursor() as cursor:
+                cursor.execute(plan)
+                steps = " ".join(str(row) for row in cursor.fetchall())
+            assert "tguser_username_id_idx" in steps
+            assert "TEMP B-TREE" not in steps
+        assert seen == ["albert", "alfred", "alice", "alina"]
+
+    def test_queries_use_indexes(self) -> None:
+        """Test that the list filters are served by the new indexes."""
+        plan = TelegramUser.objects.filter(language_code="en", id__gt=0).order_by("id").explain()
+        assert "tguser_language_id_idx" in plan
+        plan = TelegramUser.objects.filter(username__gte="al", username__lt="al\U0010ffff").explain()
+        assert "tguser_username_id_idx" in plan
+
+    def test_non_staff_forbidden(self) -> None:
+        """Test that regular users cannot list Telegram users."""
+        self.client.force_authenticate(User.objects.create_user("regular"))
+        assert self.client.get(self.url).status_code == status.HTTP_403_FORBIDDEN
+
+
+class ImportTelegramUsersCommandTest(TestCase):
+    """Tests for the import_telegram_users management command."""
+
+    def setUp(self) -> None:
+        """Write a JSONL file with valid, invalid and blank rows."""
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = Path(tmpdir.name) / "users.jsonl"
+        lines = [json.dumps({"telegram_id": 900 + i, "username": f"imported{i}"}) for i in range(5)]
+        lines[2] = json.dumps({"username": "missing id"})
+        self.path.write_text("\n".join([*lines, "", "{not json"]) + "\n")
+
+    def run_import(self, *args: str) -> str:
+        """Run the command and return its output."""
+        out = StringIO()
+        call_command("import_telegram_users", str(self.path), "--batch-size", "2", *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_import_counts(self) -> None:
+        """Test that valid rows are upserted and invalid ones counted."""
+        output = self.run_import()
+        assert "4 created, 0 updated, 0 unchanged, 2 invalid" in output
+        assert TelegramUser.objects.count() == 4  # noqa: PLR2004
+        assert not self.path.with_name("users.jsonl.checkpoint").exists()
+        assert "0 created, 0 updated, 4 unchanged" in self.run_import()
+
+    def test_resume_after_interruption(self) -> None:
+        """Test that a failed batch leaves a checkpoint the next run resumes from."""
+        real_bulk_upsert = TelegramUser.objects.bulk_upsert
+        calls = []
+
+        def failing_bulk_upsert(rows: list[dict], batch_size: int) -> dict:
+            calls.append(rows)
+            if len(calls) == 2:  # noqa: PLR2004
+                raise RuntimeError("interrupted")
+            return real_bulk_upsert(rows, batch_size=batch_size)
+
+        with mock.patch.object(type(TelegramUser.objects), "bulk_upsert", side_effect=failing_bulk_upsert), \
+                self.assertRaisesMessage(RuntimeError, "interrupted"):
+            self.run_import()
+        checkpoint = json.loads(self.path.with_name("users.jsonl.checkpoint").read_text())
+        assert checkpoint["rows"] == 2  # noqa: PLR2004
+
+        output = self.run_import()
+        assert "Resuming after 2 rows" in output
+        assert "2 created" in output
+        assert TelegramUser.objects.count() == 4  # noqa: PLR2004
+
+
+class WelcomeEmailOutboxTest(TestCase):
+    """Tests for the welcome-email outbox and its relay task."""
+
+    def setUp(self) -> None:
+        """Queue a few welcome emails."""
+        self.emails = [f"outbox{i}@example.com" for i in range(5)]
+        WelcomeEmailOutbox.objects.bulk_create(WelcomeEmailOutbox(email=email) for email in self.emails)
+
+    @override_settings(WELCOME_EMAIL_RELAY_BATCH_SIZE=2)
+    def test_relay_enqueues_batches(self) -> None:
+        """Test that pending rows are enqueued in batches and removed."""
+        with mock.patch.object(send_welcome_emails, "delay") as delay:
+            assert relay_welcome_emails() == len(self.emails)
+        assert [call.args[0] for call in delay.call_args_list] == [self.emails[:2], self.emails[2:4], self.emails[4:]]
+        assert not WelcomeEmailOutbox.objects.exists()
+
+    def test_broker_failure_keeps_rows(self) -> None:
+        """Test that rows stay in the outbox when the broker rejects them."""
+        with mock.patch.object(send_welcome_emails, "delay", side_effect=ConnectionError), \
+                self.assertRaisesMessage(ConnectionError, ""):
+            relay_welcome_emails()
+        assert WelcomeEmailOutbox.objects.count() == len(self.emails)
+
+    def test_register_rolls_back_with_outbox(self) -> None:
+        """Test that a failed outbox write also rolls back the user insert."""
+        data = {"username": "atomic", "email": "atomic@example.com", "password": "testpass123"}
+        client = APIClient(raise_request_exception=False)
+        with mock.patch.object(WelcomeEmailOutbox.objects, "create", side_effect=RuntimeError):
+            response = client.post(reverse("register"), data, format="json")
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert not User.objects.filter(username="atomic").exists()
+
+
+def hasher_params(**overrides: dict) -> dict:
+    """Return PASSWORD_HASHER_PARAMS with some hasher families replaced."""
+    params = copy.deepcopy(settings.PASSWORD_HASHER_PARAMS)
+    params.update(overrides)
+    return params
+
+
+class PasswordHasherUpgradeTest(APITestCase):
+    """Tests for configurable hashers and transparent rehash on login."""
+
+    def setUp(self) -> None:
+        """Set up credentials and the token URL."""
+        self.token_url = reverse("token_obtain_pair")
+        self.credentials = {"username": "hashed", "password": "testpass123"}
+
+    def login(self) -> User:
+        """Obtain a token and return the refreshed user."""
+        response = self.client.post(self.token_url, self.credentials, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        return User.objects.get(username="hashed")
+
+    def test_rehash_when_iterations_change(self) -> None:
+        """Test that a login upgrades a hash made with an outdated iteration count."""
+        with self.settings(PASSWORD_HASHER_PARAMS=hasher_params(pbkdf2={"iterations": 1000})):
+            User.objects.create_user(**self.credentials)
+        with self.settings(PASSWORD_HASHER_PARAMS=hasher_params(pbkdf2={"iterations": 2000})):
+            user = self.login()
+        assert user.password.startswith("pbkdf2_sha256$2000$")
+
+    def test_rehash_when_hasher_changes(self) -> None:
+        """Test that a login moves a PBKDF2 hash to the newly preferred hasher."""
+        User.objects.create_user(**self.credentials)
+        scrypt_first = [
+            "users.hashers.TunedScryptPasswordHasher",
+            "users.hashers.TunedPBKDF2PasswordHasher",
+        ]
+        params = hasher_params(scrypt={"work_factor": 2**12, "block_size": 8, "parallelism": 1})
+        with self.settings(PASSWORD_HASHERS=scrypt_first, PASSWORD_HASHER_PARAMS=params):
+            user = self.login()
+            assert user.password.startswith("scrypt$4096$")
+            assert user.check_password(self.credentials["password"])
+
+    def test_scrypt_verifies_hash_above_lowered_cost(self) -> None:
+        """Test that lowering the scrypt cost still verifies, and then rehashes, older costlier hashes."""
+        scrypt_first = ["users.hashers.TunedScryptPasswordHasher"]
+        high = hasher_params(scrypt={"work_factor": 2**15, "block_size": 8, "parallelism": 1})
+        with self.settings(PASSWORD_HASHERS=scrypt_first, PASSWORD_HASHER_PARAMS=high):
+            User.objects.create_user(**self.credentials)
+        low = hasher_params(scrypt={"work_factor": 2**12, "block_size": 8, "parallelism": 1})
+        with self.settings(PASSWORD_HASHERS=scrypt_first, PASSWORD_HASHER_PARAMS=low):
+            user = self.login()
+        assert user.password.startswith("scrypt$4096$")
+
+    def test_calibrate_command(self) -> None:
+        """Test that the calibration command recommends PBKDF2 parameters."""
+        out = StringIO()
+        call_command("calibrate_password_hasher", "--target-ms", "5", "--rounds", "1", stdout=out)
+        assert "PBKDF2_ITERATIONS=" in out.getvalue()
+
+    def test_calibrate_scrypt_memory_cap(self) -> None:
+        """Test that the scrypt search stops at the memory cap and says so."""
+        out = StringIO()
+        with mock.patch.object(calibrate_password_hasher, "SCRYPT_MAX_MEMORY", 128 * 8 * 2**13), \
+                mock.patch.object(calibrate_password_hasher, "time_hash", return_value=0.001):
+            call_command("calibrate_password_hasher", "--algorithm", "scrypt", "--target-ms", "1000", stdout=out)
+        assert "Work factor capped at 8192" in out.getvalue()
+        assert "SCRYPT_WORK_FACTOR=8192" in out.getvalue()
+
+
+@override_settings(PASSWORD_HASHER_PARAMS=hasher_params(pbkdf2={"iterations": 1000}), PASSWORD_PROVISION_WORKERS=1)
+class UserProvisionViewTest(APITestCase):
+    """Tests for the UserProvisionView (admin bulk account creation)."""
+
+    def setUp(self) -> None:
+        """Set up an admin client and a batch of users."""
+        self.url = reverse("users-provision")
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "adminpass")
+        self.client.force_authenticate(self.admin)
+        self.items = [
+            {"username": f"partner{i}", "email": f"partner{i}@example.com", "password": f"secret{i}"}
+            for i in range(4)
+        ]
+
+    def test_requires_admin(self) -> None:
+        """Test that regular users cannot provision accounts."""
+        self.client.force_authenticate(User.objects.create_user("regular", "r@example.com", "pass"))
+        response = self.client.post(self.url, self.items, format="json")
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_provision_creates_users_and_welcome_emails(self) -> None:
+        """Test that users are created with usable passwords and queued welcome emails."""
+        response = self.client.post(self.url, self.items, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["created"] == len(self.items)
+        assert [result["status"] for result in response.data["results"]] == ["created"] * len(self.items)
+        user = User.objects.get(username="partner2")
+        assert user.check_password("secret2")
+        assert user.password.startswith("pbkdf2_sha256$1000$")
+        assert WelcomeEmailOutbox.objects.filter(email__startswith="partner").count() == len(self.items)
+
+    def test_provision_reports_invalid_rows(self) -> None:
+        """Test that invalid, taken and repeated usernames are reported per row."""
+        items = [*self.items[:2], {"username": "admin", "email": "a@example.com", "password": "x"},
+                 {**self.items[0], "email": "again@example.com"}, {"username": "nomail", "password": "x"}]
+        response = self.client.post(self.url, items, format="json")
+        assert response.data["created"] == 2  # noqa: PLR2004
+        results = response.data["results"]
+        assert [result["status"] for result in results] == ["created", "created", "invalid", "invalid", "invalid"]
+        assert "already exists" in str(results[2]["errors"]["username"])
+        assert "Duplicate" in str(results[3]["errors"]["username"])
+        assert "email" in results[4]["errors"]
+        assert User.objects.filter(email="again@example.com").count() == 0
+
+    def test_provision_uses_process_pool(self) -> None:
+        """Test that hashing in worker processes uses the parent's hasher settings."""
+        with self.settings(PASSWORD_PROVISION_WORKERS=2):
+            response = self.client.post(self.url, self.items, format="json")
+        assert response.data["created"] == len(self.items)
+        for user in User.objects.filter(username__startswith="partner"):
+            assert user.password.startswith("pbkdf2_sha256$1000$")
+            assert user.check_password(f"secret{user.username[-1]}")
+
+        # The pool outlives the request and picks up hasher settings changed since it started
+        pool = hash_pool(2)
+        with self.settings(PASSWORD_PROVISION_WORKERS=2, PASSWORD_HASHER_PARAMS=hasher_params(pbkdf2={"iterations": 1001})):
+            passwords = hash_passwords(["a", "b"], 2)
+        assert hash_pool(2) is pool
+        assert all(password.startswith("pbkdf2_sha256$1001$") for password in passwords)
+
+    def test_request_size_limited(self) -> None:
+        """Test that batches over USER_PROVISION_MAX_ITEMS are rejected before hashing."""
+        with self.settings(USER_PROVISION_MAX_ITEMS=3):
+            response = self.client.post(self.url, self.items, format="json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not User.objects.filter(username__startswith="partner").exists()
+
+    def test_username_taken_during_provisioning(self) -> None:
+        """Test that a username registered after the check is reported for its row only."""
+        User.objects.create_user("partner1", "early@example.com", "pass")
+        with mock.patch("users.provisioning._taken_usernames", return_value=set()):
+            response = self.client.post(self.url, self.items, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["created"] == len(self.items) - 1
+        results = response.data["results"]
+        assert [result["status"] for result in results] == ["created", "invalid", "created", "created"]
+        assert "already exists" in str(results[1]["errors"]["username"])
+        assert User.objects.get(username="partner1").email == "early@example.com"
+        assert WelcomeEmailOutbox.objects.filter(email__startswith="partner").count() == len(self.items) - 1
+
+    def test_provision_command(self) -> None:
+        """Test that the command provisions a JSONL file and reports invalid rows."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "users.jsonl"
+            path.write_text("\n".join([*(json.dumps(item) for item in self.items), "{not json"]) + "\n")
+            out, err = StringIO(), StringIO()
+            call_command("provision_users", str(path), "--batch-size", "3", stdout=out, stderr=err)
+        assert f"Created {len(self.items)} users" in out.getvalue()
+        assert "1 invalid" in out.getvalue()
+        assert "Row 5" in err.getvalue()
+        assert User.objects.filter(username__startswith="partner").count() == len(self.items)
+
+    def test_provision_command_reports_taken_usernames(self) -> None:
+        """Test that the command reports a username taken mid-run instead of crashing."""
+        User.objects.create_user("partner2", "early@example.com", "pass")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "users.jsonl"
+            path.write_text("\n".join(json.dumps(item) for item in self.items) + "\n")
+            out, err = StringIO(), StringIO()
+            with mock.patch("users.provisioning._taken_usernames", return_value=set()):
+                call_command("provision_users", str(path), stdout=out, stderr=err)
+        assert f"Created {len(self.items) - 1} users" in out.getvalue()
+        assert "Row 3" in err.getvalue()
+        assert "already exists" in err.getvalue()
+
+
+class FastJSONTest(TestCase):
+    """Tests for the orjson-backed renderer and parser."""
+
+    data: ClassVar = {
+        "id": 7,
+        "name": "Zoë \u2028 Алексей",
+        "joined": datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.UTC),
+        "day": datetime.date(2024, 5, 1),
+        "balance": decimal.Decimal("10.50"),
+        "key": uuid.UUID(int=1),
+        "scores": {1: [1.5, None, True]},
+    }
+
+    def test_render_matches_stdlib_renderer(self) -> None:
+        """Test that the fast renderer produces JSONRenderer's exact bytes."""
+        assert FastJSONRenderer().render(self.data) == JSONRenderer().render(self.data)
+        assert FastJSONRenderer().render(None) == b""
+
+    def test_render_falls_back_for_indent_and_without_orjson(self) -> None:
+        """Test that indented output and a missing orjson use JSONRenderer."""
+        indented = FastJSONRenderer().render(self.data, "application/json; indent=4")
+        assert indented == JSONRenderer().render(self.data, "application/json; indent=4")
+        with mock.patch("users.renderers.orjson", None):
+            assert FastJSONRenderer().render(self.data) == JSONRenderer().render(self.data)
+
+    def test_parse(self) -> None:
+        """Test that bodies parse like JSONParser and malformed ones raise ParseError."""
+        body = b'{"telegram_id": 1, "username": "\\u00e9t\\u00e9"}'
+        assert FastJSONParser().parse(BytesIO(body)) == JSONParser().parse(BytesIO(body))
+        for bad in (b"{not json", b'{"value": NaN}'):
+            with self.assertRaisesMessage(ParseError, "JSON parse error"):
+                FastJSONParser().parse(BytesIO(bad))
+        with mock.patch("users.parsers.orjson", None):
+            assert FastJSONParser().parse(BytesIO(body)) == {"telegram_id": 1, "username": "été"}
+
+    def test_api_uses_fast_json(self) -> None:
+        """Test that API views render with the fast renderer and reject malformed JSON."""
+        response = self.client.post(reverse("telegram-register"), "{oops", content_type="application/json")
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert isinstance(response.accepted_renderer, FastJSONRenderer)
+        assert "JSON parse error" in response.json()["detail"]
+
+    def test_jsonbench_command(self) -> None:
+        """Test that the benchmark reports timings for both serializers."""
+        out = StringIO()
+        call_command("jsonbench", "--items", "5", "--rounds", "1", stdout=out)
+        report = json.loads(out.getvalue())
+        assert set(report["payloads"]) == {"UserSerializer", "TelegramUserSerializer"}
+        assert report["payloads"]["UserSerializer"]["render_ms"]["speedup"] is not None
+
+
+class StartupReportCommandTest(TestCase):
+    """Tests for the lean worker settings and the startup_report command."""
+
+    def test_worker_profile_boots(self) -> None:
+        """Test that the worker boots with the lean settings and skips the web apps."""
+        out = StringIO()
+        call_command(
+            "startup_report", "--targets", "worker", "--settings-modules", "klb_assignment.settings_worker",
+            "--repeat", "1", "--top", "5", stdout=out,
+        )
+        (result,) = json.loads(out.getvalue())["results"]
+        assert result["settings"] == "klb_assignment.settings_worker"
+        assert result["ready_ms"] > 0
+        assert "rest_framework" not in result["import_self_ms_by_package"]
+        assert len(result["import_self_ms_by_package"]) == 5  # noqa: PLR2004
+
+
+class TelegramUserAdminTest(TestCase):
+    """Tests for the TelegramUser admin changelist."""
+
+    def setUp(self) -> None:
+        """Create Telegram users and log in as a superuser."""
+        TelegramUser.objects.bulk_create(
+            TelegramUser(telegram_id=5000 + i, username=name)
+            for i, name in enumerate(["alice", "alex", "bob", "Alfred", "carol"])
+        )
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "adminpass"))
+        self.url = reverse("admin:users_telegramuser_changelist")
+
+    def changelist(self, query: str = "") -> tuple[list[TelegramUser], list[str]]:
+        """Load the changelist and return the listed users and the Telegram user SQL."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + query)
+        assert response.status_code == status.HTTP_200_OK
+        sql = [query["sql"] for query in queries.captured_queries if "users_telegramuser" in query["sql"]]
+        return list(response.context["cl"].result_list), sql
+
+    def test_changelist_does_not_count_table(self) -> None:
+        """Test that the unfiltered changelist estimates its size instead of counting rows."""
+        users, sql = self.changelist()
+        assert len(users) == 5  # noqa: PLR2004
+        assert not any("COUNT(" in statement for statement in sql)
+        assert any("MAX(" in statement for statement in sql)
+
+    def test_search_by_telegram_id_and_username_prefix(self) -> None:
+        """Test that digits match telegram_id exactly and text matches a username prefix."""
+        users, _ = self.changelist("?q=5002")
+        assert [user.username for user in users] == ["bob"]
+        users, sql = self.changelist("?q=%40al")
+        assert {user.username for user in users} == {"alice", "alex"}
+        assert not any("LIKE" in statement for statement in sql)
+        users, _ = self.changelist(f"?q={2**64}")
+        assert users == []
+        # Non-ASCII digits are searched as a username prefix, not converted to an id
+        for term in ("²", "٣"):
+            users, _ = self.changelist(f"?q={term}")
+            assert users == []
+
+    def test_filtered_count_is_capped(self) -> None:
+        """Test that a filtered queryset is counted up to the paginator's limit."""
+        paginator = EstimatedCountPaginator(TelegramUser.objects.exclude(username="carol").order_by("id"), 2)
+        paginator.count_limit = 3
+        assert paginator.count == 3  # noqa: PLR2004
+        assert EstimatedCountPaginator(TelegramUser.objects.order_by("id"), 2).count >= 5  # noqa: PLR2004
+
+
+class TelegramActivityTest(APITestCase):
+    """Tests for coalesced last-seen and interaction tracking."""
+
+    def setUp(self) -> None:
+        """Create Telegram users and start from an empty buffer."""
+        activity.clear()
+        caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS].clear()  # no replays of earlier tests' registrations
+        self.addCleanup(activity.clear)
+        TelegramUser.objects.bulk_create(TelegramUser(telegram_id=7000 + i, username=f"active{i}") for i in range(3))
+
+    def test_flush_writes_touches_in_one_update(self) -> None:
+        """Test that buffered touches are written with a single UPDATE."""
+        buffer = ActivityBuffer(max_pending=100, flush_interval=60)
+        seen = datetime.datetime(2026, 1, 1, tzinfo=datetime.UTC)
+        assert not buffer.touch([7000, 7001, 7000], at=seen)
+        assert not buffer.touch([9999], at=seen)
+        with self.assertNumQueries(1):
+            assert buffer.flush() == 2  # noqa: PLR2004
+        assert len(buffer) == 0
+        counts = dict(TelegramUser.objects.values_list("telegram_id", "interaction_count"))
+        assert counts == {7000: 2, 7001: 1, 7002: 0}
+        assert TelegramUser.objects.get(telegram_id=7000).last_seen_at == seen
+        buffer.touch([7000])
+        buffer.flush()
+        assert TelegramUser.objects.get(telegram_id=7000).interaction_count == 3  # noqa: PLR2004
+
+    def test_flush_is_due_by_size_or_age(self) -> None:
+        """Test that a flush becomes due when enough users are pending or the oldest touch ages."""
+        assert ActivityBuffer(max_pending=2, flush_interval=60).touch([1, 2])
+        buffer = ActivityBuffer(max_pending=100, flush_interval=60)
+        assert not buffer.touch([1])
+        with mock.patch("users.activity.time.monotonic", return_value=time.monotonic() + 61):
+            assert buffer.touch([2])
+
+    def test_failed_flush_keeps_touches(self) -> None:
+        """Test that touches survive a failed write and are merged with newer ones."""
+        buffer = ActivityBuffer(max_pending=100, flush_interval=60)
+        buffer.touch([7000])
+        with mock.patch.object(TelegramUser.objects, "add_activity", side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):  # noqa: PT027
+            buffer.flush()
+        buffer.touch([7000])
+        buffer.flush()
+        assert TelegramUser.objects.get(telegram_id=7000).interaction_count == 2  # noqa: PLR2004
+
+    def test_register_views_record_touches(self) -> None:
+        """Test that the register endpoints touch users without writing per request."""
+        self.client.post(reverse("telegram-register"), {"telegram_id": 7000, "username": "active0"}, format="json")
+        self.client.post(reverse("telegram-register-bulk"), [{"telegram_id": 7001}, {"telegram_id": 7000}], format="json")
+        assert len(activity) == 2  # noqa: PLR2004
+        assert TelegramUser.objects.get(telegram_id=7000).interaction_count == 0
+        activity.flush()
+        assert TelegramUser.objects.get(telegram_id=7000).interaction_count == 2  # noqa: PLR2004
+        assert TelegramUser.objects.get(telegram_id=7001).last_seen_at is not None
+
+    def test_background_flush(self) -> None:
+        """Test that the flush thread writes an idle buffer and that it starts once with an exit flush."""
+        activity.touch([7000])
+        with mock.patch("users.activity.time.sleep", side_effect=[None, None, RuntimeError]) as sleep, \
+                mock.patch("users.activity.connections.close_all") as close_all, \
+                self.assertRaises(RuntimeError):  # noqa: PT027
+            _flush_periodically(60)
+        sleep.assert_called_with(60)
+        close_all.assert_called_once()  # only after the round that had touches to write
+        assert len(activity) == 0
+        assert TelegramUser.objects.get(telegram_id=7000).interaction_count == 1
+
+        start_flusher.cache_clear()
+        self.addCleanup(start_flusher.cache_clear)
+        with mock.patch("users.activity.threading.Thread") as thread, mock.patch("users.activity.atexit.register") as register:
+            assert start_flusher() is start_flusher()
+        thread.return_value.start.assert_called_once()
+        register.assert_called_once_with(flush_activity)
+
+
+TEST_SHARDS = ["telegram_test_0", "telegram_test_1"]
+
+
+class ShardedTelegramUserTest(SimpleTestCase):
+    """Tests for TelegramUser sharding through TelegramUserShardRouter.
+
+    The shards are registered after SimpleTestCase blocks the test databases
+    and are the only ones allowed, so any query that reaches ``default``
+    fails the test.
+    """
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """Register two file-backed shard databases and migrate them."""
+        super().setUpClass()
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.tmpdir.cleanup)
+        for alias in TEST_SHARDS:
+            # A short busy timeout so a writer blocked on another's lock fails fast
+            connections.settings[alias] = {
+                **connections.settings["default"], "NAME": f"{cls.tmpdir.name}/{alias}.sqlite3", "OPTIONS": {"timeout": 0.2},
+            }
+        cls.databases = cls.databases | set(TEST_SHARDS)
+        cls.enterClassContext(override_settings(
+            TELEGRAM_USER_SHARDS=TEST_SHARDS, DATABASE_ROUTERS=["users.routers.TelegramUserShardRouter"],
+        ))
+        for alias in TEST_SHARDS:
+            call_command("migrate", database=alias, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """Unregister the shard databases before SimpleTestCase restores the test databases."""
+        for alias in TEST_SHARDS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        """Empty the shards."""
+        activity.clear()
+        caches[settings.TELEGRAM_REGISTER_DEDUP_CACHE_ALIAS].clear()  # no replays of earlier tests' registrations
+        for alias in TEST_SHARDS:
+            TelegramUser.objects.using(alias).all().delete()
+
+    def ids_by_shard(self, count: int) -> dict[str, list[int]]:
+        """Return ``count`` telegram ids for each shard."""
+        ids = {alias: [] for alias in TEST_SHARDS}
+        telegram_id = 1
+        while any(len(shard_ids) < count for shard_ids in ids.values()):
+            shard_ids = ids[shard_for(telegram_id)]
+            if len(shard_ids) < count:
+                shard_ids.append(telegram_id)
+            telegram_id += 1
+        return ids
+
+    def test_migrations_only_create_telegram_users_on_shards(self) -> None:
+        """Test that shards hold the TelegramUser table and nothing else."""
+        tables = connections[TEST_SHARDS[0]].introspection.table_names()
+        assert "users_telegramuser" in tables
+        assert "auth_user" not in tables
+
+    def test_writes_land_on_their_shard(self) -> None:
+        """Test that the register views, upsert and bulk upsert write to the owning shard only."""
+        ids = self.ids_by_shard(3)
+        first, *rest = [telegram_id for shard_ids in ids.values() for telegram_id in shard_ids]
+        response = self.client.post(reverse("telegram-register"), {"telegram_id": first, "username": "one"}, format="json")
+        assert response.status_code == status.HTTP_201_CREATED
+        response = self.client.post(reverse("telegram-register-bulk"), [{"telegram_id": i} for i in rest], format="json")
+        assert {result["status"] for result in response.data["results"]} == {"created"}
+        assert TelegramUser.objects.upsert({"telegram_id": first, "username": "one"})[1] is False
+
+        for alias, shard_ids in ids.items():
+            stored = set(TelegramUser.objects.using(alias).values_list("telegram_id", flat=True))
+            assert stored == set(shard_ids)
+
+    def test_parallel_writes_to_different_shards_do_not_contend(self) -> None:
+        """Test that open write transactions on two shards do not block each other, unlike one shard."""
+        ids = self.ids_by_shard(3)
+
+        def write_pair(telegram_ids: list[int]) -> list[Exception]:
+            """Hold a write transaction per id open at the same time; return the errors."""
+            barrier = threading.Barrier(len(telegram_ids), timeout=2)
+            errors = []
+
+            def writer(telegram_id: int) -> None:
+                alias = shard_for(telegram_id)
+                try:
+                    with transaction.atomic(using=alias):
+                        TelegramUser.objects.upsert({"telegram_id": telegram_id, "username": f"u{telegram_id}"})
+                        barrier.wait()  # both transactions hold their write locks here
+                except (OperationalError, threading.BrokenBarrierError) as exc:
+                    errors.append(exc)
+                finally:
+                    connections[alias].close()
+
+            threads = [threading.Thread(target=writer, args=(telegram_id,)) for telegram_id in telegram_ids]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return errors
+
+        assert write_pair([ids[TEST_SHARDS[0]][0], ids[TEST_SHARDS[1]][0]]) == []
+        same_shard_errors = write_pair(ids[TEST_SHARDS[0]][1:])
+        assert any("locked" in str(error) for error in same_shard_errors)
+
+    def test_list_view_refuses_when_sharded(self) -> None:
+        """Test that the single-database list API answers 501 instead of querying ``default``."""
+        self.client.force_authenticate(User(username="admin", is_staff=True))
+        response = self.client.get(reverse("telegram-users"))
+        assert response.status_code == status.HTTP_501_NOT_IMPLEMENTED
+        assert "/api/telegram/export/" in response.data["error"]
+
+    def test_shard_command_moves_misplaced_rows(self) -> None:
+        """Test that rows on the wrong shard are moved, keeping a newer row already on the owning shard."""
+        ids = self.ids_by_shard(3)
+        owner, other = TEST_SHARDS
+        misplaced = ids[owner]
+        TelegramUser.objects.using(other).bulk_create(
+            TelegramUser(telegram_id=telegram_id, username=f"old{telegram_id}", interaction_count=2) for telegram_id in misplaced
+        )
+        TelegramUser.objects.using(other).create(telegram_id=ids[other][0], username="stays")
+        TelegramUser.objects.using(owner).create(telegram_id=misplaced[0], username="newer")
+
+        out = StringIO()
+        call_command("shard_telegram_users", "--from", *TEST_SHARDS, "--batch-size", "2", stdout=out)
+        assert f"Moved 3 Telegram users from {other}" in out.getvalue()
+        assert f"Moved 0 Telegram users from {owner}" in out.getvalue()
+        assert list(TelegramUser.objects.using(other).values_list("username", flat=True)) == ["stays"]
+        moved = dict(TelegramUser.objects.using(owner).values_list("telegram_id", "username"))
+        assert moved == {misplaced[0]: "newer", misplaced[1]: f"old{misplaced[1]}", misplaced[2]: f"old{misplaced[2]}"}
+        assert TelegramUser.objects.using(owner).get(telegram_id=misplaced[1]).interaction_count == 2  # noqa: PLR2004
+
+        with self.settings(TELEGRAM_USER_SHARDS=[]), self.assertRaisesMessage(CommandError, "not sharded"):
+            call_command("shard_telegram_users")
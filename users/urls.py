@@ -3,7 +3,7 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path("", views.index, name="users_index"),
@@ -13,6 +13,14 @@ urlpatterns = [
 
     path("api/register/", views.RegisterView.as_view(), name="register"), # public endpoint
     path("api/profile/", views.ProfileView.as_view(), name="profile"), # protected endpoint
+    path("api/users/provision/", views.UserProvisionView.as_view(), name="users-provision"), # admin endpoint
 
     path("api/telegram/register/", views.TelegramRegisterView.as_view(), name="telegram-register"),
+    path("api/telegram/register/bulk/", views.TelegramBulkRegisterView.as_view(), name="telegram-register-bulk"),
+    path("api/telegram/users/", views.TelegramUserListView.as_view(), name="telegram-users"), # admin endpoint
+    path("api/telegram/export/", views.TelegramUserExportView.as_view(), name="telegram-export"), # admin endpoint
+
+    # async-native variants, for ASGI deployments
+    path("api/async/register/", async_views.AsyncRegisterView.as_view(), name="register-async"),
+    path("api/async/telegram/register/", async_views.AsyncTelegramRegisterView.as_view(), name="telegram-register-async"),
 ]
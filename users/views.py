@@ -1,17 +1,31 @@
 """Views for the users app."""
 
+import csv
+import hashlib
+import json
+from collections.abc import Iterator
 from typing import ClassVar
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import generics, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .models import TelegramUser
+from . import idempotency
+from .caching import profile_cache_key
+from .models import TelegramUser, WelcomeEmailOutbox
+from .pagination import TelegramUserCursorPagination
+from .provisioning import provision_users
+from .registration import register_telegram_user, register_telegram_users
 from .serializers import TelegramUserSerializer, UserSerializer
-from .tasks import send_welcome_email
 
 
 # Create your views here.
@@ -46,43 +60,180 @@ class RegisterView(APIView):
         """Register a new user."""
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            # Send welcome email asynchronously
-            send_welcome_email.delay(user.email)
+            with transaction.atomic():
+                user = serializer.save()
+                # Queue the welcome email with the user; relay_welcome_emails hands it to Celery
+                WelcomeEmailOutbox.objects.create(email=user.email)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class UserProvisionView(APIView):
+    """Admin view to create many user accounts in one request."""
+
+    permission_classes: ClassVar = [IsAdminUser]
+
+    def post(self, request: Request) -> Response:
+        """Provision a list of users and report a status for each item.
+
+        Valid items are created together with their welcome emails; invalid
+        ones are reported with their errors and do not block the rest.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "A non-empty list of users is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = settings.USER_PROVISION_MAX_ITEMS
+        if len(items) > max_items:
+            return Response({"error": f"At most {max_items} users per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = provision_users(items)
+        created = sum(result["status"] == "created" for result in results)
+        return Response({"created": created, "results": results}, status=status.HTTP_200_OK)
+
+
 class ProfileView(generics.RetrieveAPIView):
     """View to retrieve the profile of the authenticated user."""
 
     permission_classes: ClassVar = [IsAuthenticated]
 
     def get(self, request: Request) -> Response:
-        """Get the profile of the authenticated user."""
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """Get the profile of the authenticated user.
+
+        The serialized profile and its strong ETag are cached per user until
+        the user is saved; a matching ``If-None-Match`` gets a bodyless 304.
+        """
+        cache = caches[settings.PROFILE_CACHE_ALIAS]
+        key = profile_cache_key(request.user.pk)
+        cached = cache.get(key)
+        if cached is None:
+            data = dict(UserSerializer(request.user).data)
+            digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+            cached = (quote_etag(digest), data)
+            cache.set(key, cached, settings.PROFILE_CACHE_TIMEOUT)
+
+        etag, data = cached
+        client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+        if "*" in client_etags or etag in [tag.removeprefix("W/") for tag in client_etags]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data, status=status.HTTP_200_OK)
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
 class TelegramRegisterView(APIView):
     """View to handle registration or update of Telegram users."""
 
     def post(self, request: Request) -> Response:
-        """Register or update a Telegram user."""
-        telegram_id = request.data.get("telegram_id")
-
-        if not telegram_id:
-            return Response({"error": "telegram_id is required."}, status=status.HTTP_400_BAD_REQUEST)
+        """Register or update a Telegram user (see ``register_telegram_user``)."""
+        outcome = register_telegram_user(request.data, request.headers.get(idempotency.IDEMPOTENCY_HEADER))
+        return Response(outcome.data, status=outcome.status, headers=outcome.headers)
 
-        try:
-            instance = TelegramUser.objects.get(telegram_id=telegram_id)
-            serializer = TelegramUserSerializer(instance, data=request.data, partial=True)
-        except TelegramUser.DoesNotExist:
-            serializer = TelegramUserSerializer(data=request.data)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"message": "Telegram user saved."}, status=status.HTTP_201_CREATED)
+class TelegramBulkRegisterView(APIView):
+    """View to register or update many Telegram users in one request."""
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    def post(self, request: Request) -> Response:
+        """Upsert a list of Telegram users and report a status for each item (see ``register_telegram_users``)."""
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "A non-empty list of Telegram users is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = settings.TELEGRAM_BULK_MAX_ITEMS
+        if len(items) > max_items:
+            return Response({"error": f"At most {max_items} Telegram users per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(register_telegram_users(items), status=status.HTTP_200_OK)
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the value, for streaming csv output."""
+
+    def write(self, value: str) -> str:
+        """Return the value instead of buffering it."""
+        return value
+
+
+class TelegramUserExportView(APIView):
+    """View to stream every Telegram user as CSV or NDJSON (admin only)."""
+
+    permission_classes: ClassVar = [IsAdminUser]
+    fields: ClassVar = ["id", "telegram_id", "username", "first_name", "last_name", "language_code"]
+
+    def get(self, request: Request) -> StreamingHttpResponse | Response:
+        """Stream the export in the format chosen by ``?output=csv|ndjson``."""
+        output = request.query_params.get("output", "csv")
+        if output == "csv":
+            writer = csv.writer(_Echo())
+            lines = (writer.writerow(row) for row in self.iter_rows(header=True))
+            content_type = "text/csv"
+        elif output == "ndjson":
+            lines = (json.dumps(dict(zip(self.fields, row, strict=True))) + "\n" for row in self.iter_rows())
+            content_type = "application/x-ndjson"
+        else:
+            return Response({"error": "output must be 'csv' or 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="telegram_users.{output}"'
+        return response
+
+    def iter_rows(self, *, header: bool = False) -> Iterator[tuple]:
+        """Yield rows in ``id`` order, one keyset page per query.
+
+        Each page restarts from the last ``id`` seen instead of an OFFSET, so
+        memory and per-page cost stay constant however large the table is.
+        When sharded, shards are exported one after another and ``id`` is
+        only unique within a shard.
+        """
+        if header:
+            yield tuple(self.fields)
+        chunk_size = settings.TELEGRAM_EXPORT_CHUNK_SIZE
+        for alias in settings.TELEGRAM_USER_SHARDS or [None]:
+            queryset = TelegramUser.objects.using(alias).order_by("id").values_list(*self.fields)
+            last_id = 0
+            while True:
+                count = 0
+                for row in queryset.filter(id__gt=last_id)[:chunk_size].iterator(chunk_size=chunk_size):
+                    count += 1
+                    last_id = row[0]
+                    yield row
+                if count < chunk_size:
+                    break
+
+
+class TelegramUserListView(generics.ListAPIView):
+    """View to list and search Telegram users with cursor pagination (admin only).
+
+    Filters: ``language_code`` (exact) and ``username`` (prefix). Pages are
+    ordered by ``id``, or by ``(username, id)`` when a prefix is given, so
+    each page walks the matching index instead of sorting every match. Not
+    available when Telegram users are sharded, since cursors span one database.
+    """
 
+    permission_classes: ClassVar = [IsAdminUser]
+    serializer_class = TelegramUserSerializer
+    pagination_class = TelegramUserCursorPagination
+    cursor_ordering: tuple[str, ...] | None = None
+
+    def list(self, request: Request, *args: object, **kwargs: object) -> Response:
+        """List a page of Telegram users, or refuse when they are sharded."""
+        if settings.TELEGRAM_USER_SHARDS:
+            return Response(
+                {"error": "Listing Telegram users is not available when they are sharded; use /api/telegram/export/."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        return super().list(request, *args, **kwargs)
+
+    def get_queryset(self) -> QuerySet[TelegramUser]:
+        """Return Telegram users matching the query parameters."""
+        queryset = TelegramUser.objects.all()
+        language_code = self.request.query_params.get("language_code")
+        if language_code:
+            queryset = queryset.filter(language_code=language_code)
+        username = self.request.query_params.get("username")
+        if username:
+            queryset = queryset.username_prefix(username)
+            self.cursor_ordering = ("username", "id")
+        return queryset